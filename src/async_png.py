@@ -0,0 +1,95 @@
+"""
+asyncio readers for PNGs arriving over a stream (sockets, object stores).
+
+The header is known after HEADER_LENGTH bytes, so a bad upload can be
+rejected before the rest of the body is read. Reads only ever wait on the
+stream, so nothing here blocks the event loop.
+"""
+
+
+import asyncio
+import binascii
+import zlib
+
+import parse_png
+
+
+# the PNG spec caps a chunk's length at 2**31 - 1
+MAX_CHUNK_LENGTH = 2**31 - 1
+
+
+async def read_header(reader):
+    """ Returns the decoded IHDR (width, height, color type...) of the PNG on
+        `reader`, having consumed exactly HEADER_LENGTH bytes of it
+
+        reader
+            @type - asyncio.StreamReader
+            @param - positioned at the start of the file
+
+        Raises ValueError for a bad signature, a missing IHDR or a bad CRC,
+        checking each as soon as enough bytes have arrived.
+    """
+    data = b""
+    while True:
+        header = parse_png.parse_header(data)
+        if (header is not None):
+            return header
+
+        more = await reader.read(parse_png.HEADER_LENGTH - len(data))
+        if (not more):
+            raise ValueError("stream ended after {} bytes, inside the header".format(len(data)))
+        data += more
+
+async def iter_chunks(reader, verify_crc=True, max_chunk=None):
+    """ Asynchronously yields the chunks after the header, as dicts with the
+        keys `break_into_chunks` uses, ending after IEND
+
+        reader
+            @type - asyncio.StreamReader
+            @param - positioned just after the header, see `read_header`
+
+        verify_crc
+            @type - bool
+            @param - raise ValueError on a chunk whose CRC doesn't match
+
+        max_chunk
+            @type - int
+            @param - raise ValueError on a chunk declaring more data than
+                     this, before any of it is read. Lengths over
+                     MAX_CHUNK_LENGTH are always refused
+    """
+    limit = MAX_CHUNK_LENGTH if max_chunk is None else min(max_chunk, MAX_CHUNK_LENGTH)
+    while True:
+        try:
+            header = await reader.readexactly(8)
+            chunk_len = int(binascii.hexlify(header[:4]), 16)
+            if (chunk_len > limit):
+                raise ValueError("{} declares {} bytes, over the limit of {}".format(
+                    header[4:].decode("latin-1"), chunk_len, limit))
+
+            raw_chunk_data = await reader.readexactly(chunk_len)
+            chunk_CRC = await reader.readexactly(4)
+        except asyncio.IncompleteReadError as e:
+            raise ValueError("stream ended inside a chunk ({} bytes short)".format(
+                e.expected - len(e.partial)))
+
+        chunk_name = header[4:].decode("latin-1")
+        if (verify_crc and zlib.crc32(header[4:] + raw_chunk_data) != int.from_bytes(chunk_CRC, "big")):
+            raise ValueError("{} CRC mismatch".format(chunk_name))
+
+        yield {
+            "length" : len(raw_chunk_data),
+            "data" : binascii.hexlify(raw_chunk_data).decode("ascii"),
+            "raw_data" : raw_chunk_data,
+            "crc" : binascii.hexlify(chunk_CRC).decode("ascii"),
+            "type" : chunk_name,
+        }
+
+        if (chunk_name == "IEND"):
+            return
+
+async def read_png(reader, verify_crc=True, max_chunk=None):
+    """ Returns (IHDR, [chunks]) for the whole PNG on `reader` """
+    header = await read_header(reader)
+    chunks = [chunk async for chunk in iter_chunks(reader, verify_crc, max_chunk)]
+    return header, chunks
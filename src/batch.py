@@ -0,0 +1,199 @@
+"""
+Inspect many PNGs at once.
+
+Takes a directory tree or a manifest (one path per line), checks each file's
+signature, reads its IHDR and chunk inventory and writes one JSON object per
+file. Header work is I/O bound and runs in a thread pool; decoding the image
+data is CPU bound and runs in a process pool.
+
+    python batch.py /mnt/mirror --workers 32 > audit.jsonl
+"""
+
+
+import os, sys
+import json
+import time
+import zlib
+
+import parse_png
+import tracing
+
+
+def iter_paths(source, extensions=(".png",)):
+    """ Yields the file paths to inspect
+
+        source
+            @type - str
+            @param - a directory, walked recursively for files ending in one
+                     of `extensions`, or a manifest file listing one path per
+                     line (blank lines and lines starting with # are skipped)
+    """
+    if (os.path.isdir(source)):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if (name.lower().endswith(extensions)):
+                    yield os.path.join(root, name)
+        return
+
+    with open(source) as manifest:
+        for line in manifest:
+            line = line.strip()
+            if (line and not line.startswith("#")):
+                yield line
+
+def inspect_file(filepath, decode=False):
+    """ Returns a JSON-serializable summary of one file
+
+        filepath
+            @type - str
+            @param - path to the (supposed) PNG
+
+        decode
+            @type - bool
+            @param - also inflate the image data and check its length against
+                     the IHDR. Reads the whole file instead of seeking past IDAT
+
+        Failures are recorded under "error" rather than raised, so one bad
+        file can't stop a batch.
+    """
+    timings = {}
+    result = {"path" : filepath, "is_png" : False}
+    start = time.perf_counter()
+    try:
+        with open(filepath, "rb") as f:
+            result["is_png"] = parse_png.is_png(f.read(8))
+            timings["signature"] = time.perf_counter() - start
+            if (result["is_png"]):
+                _inspect_chunks(f, result, decode, timings)
+
+    except (OSError, ValueError, zlib.error) as e:
+        result["error"] = "{}: {}".format(type(e).__name__, e)
+
+    timings["total"] = time.perf_counter() - start
+    result["timings"] = timings
+    return result
+
+def _inspect_chunks(f, result, decode, timings):
+    start = time.perf_counter()
+    chunks = []
+    idat = []
+    idat_bytes = 0
+    for offset, chunk_len, chunk_name in parse_png.iter_chunk_headers(f):
+        chunks.append(chunk_name)
+        if (chunk_name == "IHDR"):
+            raw = f.read(chunk_len)
+            result["IHDR"] = parse_png.process_IHDR(raw.hex())
+
+        elif (chunk_name == "IDAT"):
+            idat_bytes += chunk_len
+            if (decode):
+                idat.append(f.read(chunk_len))
+
+    result["chunks"] = chunks
+    result["idat_bytes"] = idat_bytes
+    result["size"] = f.seek(0, os.SEEK_END)
+    timings["chunks"] = time.perf_counter() - start
+
+    if (not decode or "IHDR" not in result):
+        return
+
+    start = time.perf_counter()
+    result["decoded_bytes"] = len(zlib.decompress(b"".join(idat)))
+    timings["decode"] = time.perf_counter() - start
+
+def inspect_many(paths, workers=8, decode=False, processes=None):
+    """ Yields `inspect_file` results as they complete, not in input order
+
+        paths
+            @type - iterable of str
+            @param - consumed lazily, so it can be a generator over millions
+                     of files
+
+        workers
+            @type - int
+            @param - pool size. At most 4 * workers files are queued at once
+
+        processes
+            @type - bool
+            @param - use a process pool instead of threads. Defaults to True
+                     when decoding
+    """
+    # the pools (and multiprocessing behind ProcessPoolExecutor) are only
+    # loaded by callers that fan out
+    from concurrent.futures import (
+        ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+    )
+
+    if (processes is None):
+        processes = decode
+
+    pool_cls = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    max_pending = workers * 4
+    paths = iter(paths)
+
+    with pool_cls(max_workers=workers) as pool:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while (not exhausted and len(pending) < max_pending):
+                try:
+                    fp = next(paths)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(inspect_file, fp, decode))
+
+            if (not pending):
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def write_jsonl(results, out):
+    """ Write each result as one line of JSON, flushing as it goes.
+        Returns the number of lines written
+    """
+    n = 0
+    for result in results:
+        out.write(json.dumps(result, sort_keys=True))
+        out.write("\n")
+        out.flush()
+        n += 1
+
+    return n
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect PNG headers and chunks in bulk")
+    parser.add_argument("source", help="directory to walk, or a manifest file of paths")
+    parser.add_argument("-w", "--workers", type=int, default=8)
+    parser.add_argument("-o", "--output", help="file to write JSON lines to (default stdout)")
+    parser.add_argument("--decode", action="store_true",
+                        help="inflate image data too (uses processes)")
+    parser.add_argument("--threads", action="store_true",
+                        help="use threads even when decoding")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write per-stage timing histograms here as JSON. "
+                             "Only spans in this process are seen, so pair "
+                             "with --threads when decoding")
+    args = parser.parse_args(argv)
+
+    processes = args.decode and not args.threads
+    profiler = tracing.Profiler() if args.profile else None
+    with tracing.tracing(profiler):
+        results = inspect_many(iter_paths(args.source), args.workers, args.decode, processes)
+        if (args.output is None):
+            write_jsonl(results, sys.stdout)
+        else:
+            with open(args.output, "w") as out:
+                write_jsonl(results, out)
+
+    if (profiler is not None):
+        with open(args.profile, "w") as f:
+            f.write(profiler.to_json())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+An in-memory LRU cache in front of header parsing and pixel decoding, for
+servers that read the same hot PNGs over and over.
+
+Entries are keyed on (path, mtime, size) by default, so an edited file is
+never served stale, or on a hash of the file's contents so identical files
+under different paths share an entry. Eviction is least-recently-used
+against a byte budget.
+
+    cache = PNGCache(max_bytes=256 * 2**20)
+    header, rows = cache.pixels(fp)
+"""
+
+
+import os
+import threading
+from collections import OrderedDict
+
+import parse_png
+
+
+# what a cached header dict is charged against the budget
+HEADER_COST = 512
+
+
+class PNGCache(object):
+    def __init__(self, max_bytes=64 * 2**20, key="stat"):
+        """
+        max_bytes
+            @type - int
+            @param - byte budget. Entries bigger than this aren't cached
+
+        key
+            @type - str
+            @param - "stat" keys on (path, mtime, size); "hash" keys on a
+                     hash of the file contents, which costs a full read
+        """
+        if (key not in ("stat", "hash")):
+            raise ValueError("key must be 'stat' or 'hash', you passed : {}".format(key))
+
+        self._max_bytes = max_bytes
+        self._key = key
+        self._entries = OrderedDict() # key : (value, cost)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes
+
+    @property
+    def stats(self):
+        """ counters, as a dict """
+        with self._lock:
+            return {
+                "hits" : self._hits,
+                "misses" : self._misses,
+                "evictions" : self._evictions,
+                "entries" : len(self._entries),
+                "bytes" : self._bytes,
+            }
+
+    def header(self, filepath):
+        """ the decoded IHDR of `filepath`, as `process_IHDR` returns it. A
+            fresh copy each call, so callers can't change the cached one
+        """
+        return dict(self._get("header", filepath, _load_header, lambda v : HEADER_COST))
+
+    def pixels(self, filepath):
+        """ (IHDR fields, rows) as `decode.decode_rows` returns them. The rows
+            array is shared between callers, so it's read-only; the IHDR
+            fields are copied, as in `header`
+        """
+        header, rows = self._get("pixels", filepath, _load_pixels,
+                                 lambda v : v[1].nbytes + HEADER_COST)
+        return dict(header), rows
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _make_key(self, kind, filepath):
+        if (self._key == "hash"):
+            import hashlib
+            with open(filepath, "rb") as f:
+                return (kind, hashlib.blake2b(f.read(), digest_size=16).digest())
+
+        st = os.stat(filepath)
+        return (kind, os.path.abspath(filepath), st.st_mtime_ns, st.st_size)
+
+    def _get(self, kind, filepath, load, cost_of):
+        key = self._make_key(kind, filepath)
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is not None):
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+
+        # load outside the lock so one slow decode doesn't stall every
+        # other reader. Two threads missing on the same key both load it;
+        # the second insert wins
+        value = load(filepath)
+        cost = cost_of(value)
+        if (cost > self._max_bytes):
+            return value
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if (old is not None):
+                self._bytes -= old[1]
+
+            self._entries[key] = (value, cost)
+            self._bytes += cost
+            while self._bytes > self._max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._evictions += 1
+
+        return value
+
+
+def _load_header(filepath):
+    with open(filepath, "rb") as f:
+        header = parse_png.parse_header(f.read(parse_png.HEADER_LENGTH))
+
+    if (header is None):
+        raise ValueError("file too short to be a png : {}".format(filepath))
+    return header
+
+def _load_pixels(filepath):
+    # decode brings in NumPy; header-only users never need it
+    import decode
+    header, rows = decode.decode_file(filepath)
+    rows.flags.writeable = False
+    return header, rows
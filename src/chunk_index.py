@@ -0,0 +1,187 @@
+"""
+A sidecar index of where each chunk of a PNG sits, for random access into
+large files that get opened over and over.
+
+The index records offset, length, type and CRC for every chunk, plus the
+file's size and mtime so a stale index is noticed and rebuilt. It is stored
+next to the PNG as `<file>.chunkidx`, 24 bytes per chunk.
+
+    index = open_index(fp)
+    for entry in index.find(b"tEXt"):
+        text = read_chunk(fp, entry)
+"""
+
+
+import os
+import struct
+import zlib
+from collections import namedtuple
+
+import parse_png
+
+
+INDEX_MAGIC = b"PNGIDX"
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".chunkidx"
+
+# magic, version, file size, file mtime (ns), number of entries
+_HEADER = struct.Struct(">6sBQqI")
+# chunk offset, data length, type, CRC
+_ENTRY = struct.Struct(">QI4sI")
+
+IndexEntry = namedtuple("IndexEntry", ["offset", "length", "type_code", "crc"])
+
+
+class ChunkIndex(object):
+    def __init__(self, size=0, mtime_ns=0, entries=None):
+        """
+        size, mtime_ns
+            @type - int
+            @param - of the indexed file when the index was built
+
+        entries
+            @type - list
+            @param - IndexEntry per chunk, in file order
+        """
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.entries = entries or []
+
+    def find(self, type_code):
+        """ entries for chunks of type `type_code`, e.g. b"IDAT" """
+        return [e for e in self.entries if e.type_code == type_code]
+
+    def is_current(self, filepath):
+        """ True if `filepath` hasn't changed since the index was built """
+        st = os.stat(filepath)
+        return st.st_size == self.size and st.st_mtime_ns == self.mtime_ns
+
+    def to_bytes(self):
+        header = _HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.size,
+                              self.mtime_ns, len(self.entries))
+        return header + b"".join(_ENTRY.pack(*e) for e in self.entries)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """ Raises ValueError if `data` isn't a readable index """
+        if (len(data) < _HEADER.size):
+            raise ValueError("index too short")
+
+        magic, version, size, mtime_ns, count = _HEADER.unpack_from(data)
+        if (magic != INDEX_MAGIC or version != INDEX_VERSION):
+            raise ValueError("not a version {} chunk index".format(INDEX_VERSION))
+
+        if (len(data) != _HEADER.size + count * _ENTRY.size):
+            raise ValueError("index length doesn't match its entry count")
+
+        entries = [IndexEntry(*e) for e in _ENTRY.iter_unpack(data[_HEADER.size:])]
+        return cls(size, mtime_ns, entries)
+
+
+def index_path(filepath):
+    return filepath + INDEX_SUFFIX
+
+def build_index(filepath):
+    """ Returns a ChunkIndex for `filepath`, reading only chunk headers and
+        CRCs (chunk data is seeked past)
+    """
+    st = os.stat(filepath)
+    entries = []
+    with open(filepath, "rb") as f:
+        if (not parse_png.is_png(f.read(8))):
+            raise ValueError("not a png : {}".format(filepath))
+
+        for offset, chunk_len, chunk_name in parse_png.iter_chunk_headers(f):
+            f.seek(chunk_len, os.SEEK_CUR)
+            crc = f.read(4)
+            if (len(crc) < 4):
+                raise ValueError("{} at {} is truncated".format(chunk_name, offset))
+
+            entries.append(IndexEntry(offset, chunk_len, chunk_name.encode("latin-1"),
+                                      int.from_bytes(crc, "big")))
+
+    return ChunkIndex(st.st_size, st.st_mtime_ns, entries)
+
+def save_index(index, path):
+    """ Write atomically, so a reader never sees half an index. Each writer
+        gets its own temp file, so two processes indexing the same PNG
+        can't rename each other's away. The index ends up with the mode a
+        plain open() would give it, not mkstemp's 0600, so other users can
+        read it too
+    """
+    import tempfile
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(index.to_bytes())
+        os.chmod(tmp, 0o666 & ~_umask())
+        os.replace(tmp, path)
+    except BaseException:
+        if (os.path.exists(tmp)):
+            os.remove(tmp)
+        raise
+
+def _umask():
+    # only readable by setting it, so put it straight back
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+def load_index(filepath, path=None):
+    """ Returns the saved ChunkIndex for `filepath`, or None if there isn't
+        one, it can't be read, or the file has changed since it was built
+    """
+    try:
+        with open(path or index_path(filepath), "rb") as f:
+            index = ChunkIndex.from_bytes(f.read())
+    except (OSError, ValueError):
+        return None
+
+    return index if index.is_current(filepath) else None
+
+def open_index(filepath, path=None, save=True):
+    """ Returns a current ChunkIndex for `filepath`, loading the sidecar if
+        it's up to date and otherwise building (and by default saving) a new one
+
+        A sidecar that can't be written (e.g. a read-only directory) is
+        skipped; the freshly built index is still returned.
+    """
+    index = load_index(filepath, path)
+    if (index is None):
+        index = build_index(filepath)
+        if (save):
+            try:
+                save_index(index, path or index_path(filepath))
+            except OSError:
+                pass
+
+    return index
+
+def read_chunk(filepath, entry, verify_crc=True):
+    """ Returns the data of one indexed chunk, seeking straight to it """
+    with open(filepath, "rb") as f:
+        f.seek(entry.offset + 8)
+        data = f.read(entry.length)
+
+    if (verify_crc and zlib.crc32(entry.type_code + data) != entry.crc):
+        raise ValueError("{} at {} CRC mismatch".format(entry.type_code, entry.offset))
+
+    return data
+
+def read_idat(filepath, index, start=0, stop=None):
+    """ Returns bytes [start:stop] of the compressed image data, the IDAT
+        chunks' data joined together, reading only the IDATs that overlap
+    """
+    out = []
+    pos = 0 # position within the joined IDAT data
+    with open(filepath, "rb") as f:
+        for entry in index.find(b"IDAT"):
+            lo = max(start, pos)
+            hi = pos + entry.length if stop is None else min(stop, pos + entry.length)
+            if (lo < hi):
+                f.seek(entry.offset + 8 + lo - pos)
+                out.append(f.read(hi - lo))
+            pos += entry.length
+
+    return b"".join(out)
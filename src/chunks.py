@@ -0,0 +1,360 @@
+"""
+Typed, lazily decoded PNG chunks.
+
+A chunk object only records where it sits in the source buffer. Its fields
+are unpacked from the buffer when accessed, so walking a file with thousands
+of text chunks costs three ints per chunk until something is actually read.
+
+    for chunk in read_chunks(open_file(fp)):
+        if (isinstance(chunk, tEXtChunk)):
+            print(chunk.keyword, chunk.text)
+"""
+
+
+import binascii
+import struct
+import zlib
+
+import tracing
+
+
+PNG_SIGNATURE = binascii.unhexlify("89504e470d0a1a0a")
+
+
+class Chunk(object):
+    """ Any chunk. Subclasses add properties for their fields """
+    __slots__ = ("_buf", "offset", "length")
+
+    def __init__(self, buf, offset, length):
+        """
+        buf
+            @type - memoryview
+            @param - the whole source buffer, shared by every chunk from it
+
+        offset
+            @type - int
+            @param - position of the chunk's length field within buf
+
+        length
+            @type - int
+            @param - length of the chunk's data
+        """
+        self._buf = buf
+        self.offset = offset
+        self.length = length
+
+    @property
+    def type_code(self):
+        """ the raw 4 byte chunk type, e.g. b"IHDR" """
+        return bytes(self._buf[self.offset + 4:self.offset + 8])
+
+    @property
+    def type(self):
+        """ the chunk type as a str, e.g. "IHDR" """
+        return self.type_code.decode("latin-1")
+
+    @property
+    def critical(self):
+        return is_critical(self.type_code)
+
+    @property
+    def safe_to_copy(self):
+        return is_safe_to_copy(self.type_code)
+
+    @property
+    def data_offset(self):
+        return self.offset + 8
+
+    @property
+    def data(self):
+        """ the chunk's data, as a view into the source buffer """
+        return self._buf[self.data_offset:self.data_offset + self.length]
+
+    @property
+    def crc(self):
+        return struct.unpack_from(">I", self._buf, self.data_offset + self.length)[0]
+
+    @tracing.traced("crc", lambda args, r : args[0].length + 4)
+    def check_crc(self):
+        """ True if the stored CRC matches the type and data """
+        start = self.offset + 4
+        return zlib.crc32(self._buf[start:self.data_offset + self.length]) == self.crc
+
+    def _unpack(self, fmt, at=0):
+        return struct.unpack_from(fmt, self._buf, self.data_offset + at)
+
+    def __repr__(self):
+        return "<{} at {}, {} bytes>".format(self.type, self.offset, self.length)
+
+
+class IHDRChunk(Chunk):
+    __slots__ = ()
+
+    @property
+    def width(self):
+        return self._unpack(">I")[0]
+
+    @property
+    def height(self):
+        return self._unpack(">I", 4)[0]
+
+    @property
+    def bit_depth(self):
+        return self._buf[self.data_offset + 8]
+
+    @property
+    def color_type(self):
+        return self._buf[self.data_offset + 9]
+
+    @property
+    def compression_method(self):
+        return self._buf[self.data_offset + 10]
+
+    @property
+    def filter_method(self):
+        return self._buf[self.data_offset + 11]
+
+    @property
+    def interlace_method(self):
+        return self._buf[self.data_offset + 12]
+
+    def fields(self):
+        """ all fields at once, as `process_IHDR` returns them """
+        keys = ("width", "height", "bit_depth", "color_type",
+                "compression_method", "filter_method", "interlace_method")
+        return dict(zip(keys, self._unpack(">IIBBBBB")))
+
+
+class PLTEChunk(Chunk):
+    __slots__ = ()
+
+    def __len__(self):
+        return self.length // 3
+
+    def __getitem__(self, i):
+        """ the (r, g, b) of palette entry i """
+        if (not 0 <= i < len(self)):
+            raise IndexError(i)
+        return self._unpack("BBB", 3 * i)
+
+    @property
+    def entries(self):
+        return [self[i] for i in range(len(self))]
+
+
+class tRNSChunk(Chunk):
+    """ what the data means depends on the IHDR color type """
+    __slots__ = ()
+
+    @property
+    def alpha(self):
+        """ color type 3: one alpha byte per palette entry """
+        return bytes(self.data)
+
+    @property
+    def grey(self):
+        """ color type 0: the one transparent grey level """
+        return self._unpack(">H")[0]
+
+    @property
+    def rgb(self):
+        """ color type 2: the one transparent (r, g, b) """
+        return self._unpack(">HHH")
+
+
+class _TextChunk(Chunk):
+    """ text chunks start with a null-terminated Latin-1 keyword """
+    __slots__ = ()
+
+    @property
+    def keyword(self):
+        return bytes(self.data).partition(b"\x00")[0].decode("latin-1")
+
+    def _after_keyword(self):
+        return bytes(self.data).partition(b"\x00")[2]
+
+
+class tEXtChunk(_TextChunk):
+    __slots__ = ()
+
+    @property
+    def text(self):
+        return self._after_keyword().decode("latin-1")
+
+
+class zTXtChunk(_TextChunk):
+    __slots__ = ()
+
+    @property
+    def compression_method(self):
+        return self._after_keyword()[0]
+
+    @property
+    def text(self):
+        return zlib.decompress(self._after_keyword()[1:]).decode("latin-1")
+
+
+class iTXtChunk(_TextChunk):
+    __slots__ = ()
+
+    @property
+    def text(self):
+        return self.fields()["text"]
+
+    def fields(self):
+        """ all fields at once, as `process_iTXt` returns them """
+        return parse_iTXt(bytes(self.data))
+
+
+class pHYsChunk(Chunk):
+    __slots__ = ()
+
+    @property
+    def ppu_x(self):
+        return self._unpack(">I")[0]
+
+    @property
+    def ppu_y(self):
+        return self._unpack(">I", 4)[0]
+
+    @property
+    def unit(self):
+        return self._buf[self.data_offset + 8]
+
+
+class tIMEChunk(Chunk):
+    __slots__ = ()
+
+    def fields(self):
+        keys = ("year", "month", "day", "hour", "minute", "second")
+        return dict(zip(keys, self._unpack(">HBBBBB")))
+
+
+class gAMAChunk(Chunk):
+    __slots__ = ()
+
+    @property
+    def gamma(self):
+        """ the file gamma, stored as gamma * 100000 """
+        return self._unpack(">I")[0] / 100000
+
+
+def parse_iTXt(raw):
+    """ Returns the fields of an iTXt chunk's data as a dict """
+
+    # Keyword, then a null separator
+    keyword, _, raw = raw.partition(b"\x00")
+
+    # Compression flag and method
+    # 1 byte each. Only method 0 (zlib) exists
+    compression_flag = raw[0]
+    compression_method = raw[1]
+    raw = raw[2:]
+
+    # Language tag and translated keyword, each null terminated
+    language, _, raw = raw.partition(b"\x00")
+    translated_keyword, _, text = raw.partition(b"\x00")
+
+    if (compression_flag):
+        text = zlib.decompress(text)
+
+    return {
+        "keyword" : keyword.decode("latin-1"),
+        "compression_flag" : compression_flag,
+        "compression_method" : compression_method,
+        "language" : language.decode("ascii"),
+        "translated_keyword" : translated_keyword.decode("utf-8"),
+        "text" : text.decode("utf-8"),
+    }
+
+
+# Chunk type property bits: bit 5 (0x20) of each of the four type bytes.
+# Lowercase first letter is ancillary, lowercase second is private, and
+# lowercase fourth is safe for editors to copy into a modified file
+def is_critical(type_code):
+    return not type_code[0] & 0x20
+
+def is_public(type_code):
+    return not type_code[1] & 0x20
+
+def is_safe_to_copy(type_code):
+    return bool(type_code[3] & 0x20)
+
+
+# Every known chunk type, keyed on its raw 4 bytes, mapped to the Chunk class
+# that handles it. Looked up once per chunk while walking a file.
+CHUNK_TYPES = {
+    b"IHDR" : IHDRChunk,
+    b"PLTE" : PLTEChunk,
+    b"IDAT" : Chunk,
+    b"IEND" : Chunk,
+    b"tRNS" : tRNSChunk,
+    b"cHRM" : Chunk,
+    b"gAMA" : gAMAChunk,
+    b"iCCP" : Chunk,
+    b"sBIT" : Chunk,
+    b"sRGB" : Chunk,
+    b"tEXt" : tEXtChunk,
+    b"zTXt" : zTXtChunk,
+    b"iTXt" : iTXtChunk,
+    b"bKGD" : Chunk,
+    b"hIST" : Chunk,
+    b"pHYs" : pHYsChunk,
+    b"sPLT" : Chunk,
+    b"tIME" : tIMEChunk,
+}
+
+def register_chunk_type(type_code, handler=Chunk):
+    """ Add (or replace) the handler for a chunk type
+
+        type_code
+            @type - bytes
+            @param - the 4 byte chunk type, e.g. b"prVt"
+
+        handler
+            @type - type
+            @param - a Chunk subclass, built as handler(buf, offset, length)
+                     for every chunk of this type
+    """
+    if (len(type_code) != 4 or not type_code.isalpha()):
+        raise ValueError("chunk types are 4 ASCII letters, you passed : {}".format(type_code))
+
+    CHUNK_TYPES[bytes(type_code)] = handler
+
+def chunk_name(type_code):
+    """ the str name of a registered chunk type, otherwise None """
+    if (type_code in CHUNK_TYPES):
+        return type_code.decode("latin-1")
+    return None
+
+
+def iter_chunks(data):
+    """ Yields a typed Chunk for each chunk in `data`, without copying or
+        decoding any chunk data
+
+        data
+            @type - bytes-like
+            @param - a PNG, with or without its signature
+    """
+    buf = memoryview(data)
+    offset = 8 if buf[:8] == PNG_SIGNATURE else 0
+    end = len(buf)
+    while offset + 8 <= end:
+        chunk_len, type_code = struct.unpack_from(">I4s", buf, offset)
+        if (offset + 12 + chunk_len > end):
+            raise ValueError("{} at {} runs past the end of the data".format(type_code, offset))
+
+        yield CHUNK_TYPES.get(type_code, Chunk)(buf, offset, chunk_len)
+
+        if (type_code == b"IEND"):
+            return
+        offset += chunk_len + 12
+
+def pack_chunk(type_code, data=b""):
+    """ Returns a complete chunk (length, type, data, CRC) as bytes """
+    body = bytes(type_code) + bytes(data)
+    return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+def read_chunks(data):
+    """ Returns a list of typed Chunks, see `iter_chunks` """
+    return list(iter_chunks(data))
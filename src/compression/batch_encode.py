@@ -0,0 +1,136 @@
+import numpy as np
+
+from compression.huffman import (
+    build_huffByte_freqs, huffBytes_to_Nodes, build_huffman_tree
+)
+
+
+# the tree builder doesn't limit code lengths; tables hold up to this many bits
+MAX_CODE_LENGTH = 64
+
+
+def build_tree(symbols, sample_size=1.00):
+    """ Returns a HuffmanTree for a symbol array
+
+        symbols
+            @type - numpy.ndarray
+            @param - uint8 or uint16 symbols
+
+        sample_size
+            @type - float
+            @param - what percent of the data to review for frequencies
+    """
+    huffbytes = build_huffByte_freqs(np.asarray(symbols).tolist(), sample_size)
+    # not sort_NodeList: its recursion budget is shared between calls, and
+    # once spent it hands lists back unsorted
+    node_list = sorted(huffBytes_to_Nodes(huffbytes),
+                       key=lambda n : n.value.frequency, reverse=True)
+    return build_huffman_tree(node_list)
+
+def code_tables(mapping, alphabet_size=256):
+    """ Returns (codes, lengths) arrays indexed by symbol, from a
+        HuffmanTree mapping. Symbols without a code have length 0
+
+        mapping
+            @type - dic
+            @param - {HuffByte.value : HuffByte}, as HuffmanTree.mapping
+
+        alphabet_size
+            @type - int
+            @param - 256 for bytes, up to 65536 for uint16 alphabets
+
+        An encoded_value carries a leading 1 ahead of the code bits, which
+        is stripped here. A tree of one symbol gives it an empty code, so
+        it is encoded as the single bit 0 instead. Codes longer than
+        MAX_CODE_LENGTH bits (very skewed frequencies) raise ValueError.
+    """
+    codes = np.zeros(alphabet_size, dtype=np.uint64)
+    lengths = np.zeros(alphabet_size, dtype=np.uint8)
+    for symbol, hb in mapping.items():
+        l = hb.encoded_value.bit_length() - 1
+        _check_length(symbol, l)
+        codes[symbol] = hb.encoded_value ^ (1 << l)
+        lengths[symbol] = max(l, 1)
+
+    return codes, lengths
+
+def tree_code_tables(tree, alphabet_size=256):
+    """ `code_tables` read straight off a HuffmanTree's nodes
+
+        A node counts as a leaf when it has no children, so symbol 0 gets a
+        code too (HuffmanTree._get_leaves skips leaves whose value is falsy).
+        Left turns are 1, right turns are 0, as in HuffmanTree.
+    """
+    codes = np.zeros(alphabet_size, dtype=np.uint64)
+    lengths = np.zeros(alphabet_size, dtype=np.uint8)
+    stack = [(tree.tree, 0, 0)]
+    while stack:
+        node, code, length = stack.pop()
+        if (node is None):
+            continue
+
+        if (node.left is None and node.right is None):
+            _check_length(node.value.value, length)
+            codes[node.value.value] = code
+            lengths[node.value.value] = max(length, 1)
+            continue
+
+        stack.append((node.left, (code << 1) | 1, length + 1))
+        stack.append((node.right, code << 1, length + 1))
+
+    return codes, lengths
+
+def encode_symbols(symbols, codes, lengths):
+    """ Returns (encoded bytes, number of bits). Codes are packed MSB first
+        with no separators; the last byte is padded with 0 bits
+
+        symbols
+            @type - numpy.ndarray
+            @param - uint8 or uint16 symbols to encode
+
+        codes, lengths
+            @type - numpy.ndarray
+            @param - as `code_tables` returns them
+
+        Each symbol's code and length are gathered with one fancy index, a
+        cumulative sum of lengths gives every code's bit offset, and the
+        bits are scattered one bit position at a time, so the Python loop
+        runs max(lengths) times regardless of input size. Uses one byte of
+        scratch per output bit.
+    """
+    symbols = np.asarray(symbols)
+    if (symbols.dtype not in (np.uint8, np.uint16)):
+        raise TypeError("symbols must be uint8 or uint16, you passed : {}".format(symbols.dtype))
+
+    if (not len(symbols)):
+        return b"", 0
+
+    sym_lengths = lengths[symbols].astype(np.int64)
+    if (not sym_lengths.all()):
+        missing = np.unique(symbols[sym_lengths == 0])
+        raise ValueError("no code for symbols : {}".format(missing[:10].tolist()))
+
+    sym_codes = codes[symbols]
+    ends = np.cumsum(sym_lengths)
+    starts = ends - sym_lengths
+    nbits = int(ends[-1])
+
+    bits = np.zeros(nbits, dtype=np.uint8)
+    for j in range(int(sym_lengths.max())):
+        has_bit = sym_lengths > j
+        shift = (sym_lengths[has_bit] - 1 - j).astype(np.uint64)
+        bits[starts[has_bit] + j] = (sym_codes[has_bit] >> shift) & 1
+
+    return np.packbits(bits).tobytes(), nbits
+
+def _check_length(symbol, length):
+    if (length > MAX_CODE_LENGTH):
+        raise ValueError("code for symbol {} is {} bits, over the {} bit limit".format(
+            symbol, length, MAX_CODE_LENGTH))
+
+def encode_with_tree(symbols, tree):
+    """ `encode_symbols` using the codes of a HuffmanTree """
+    symbols = np.asarray(symbols)
+    alphabet_size = 256 if symbols.dtype == np.uint8 else 65536
+    codes, lengths = tree_code_tables(tree, alphabet_size)
+    return encode_symbols(symbols, codes, lengths)
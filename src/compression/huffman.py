@@ -1,4 +1,6 @@
 import random, sys
+import math, time
+from collections import Counter
 
 class HuffByte(object):
     """ a data object representing a byte, its encoding, and its frequency
@@ -115,6 +117,10 @@ class HuffmanTree(object):
     def tree(self, node):
         self._tree = node
 
+    def code_lengths(self):
+        """ {HuffByte.value : length of its code in bits}, from `mapping` """
+        return {k : v.encoded_value.bit_length() - 1 for k, v in self.mapping.items()}
+
     def tree_to_mapping(self):
         self.mapping = self._build_mapping()
 
@@ -240,11 +246,95 @@ class HuffmanTree(object):
         n = prev_node.left if direction == 1 else prev_node.right
         self._add_leaves(n, cur_shift, leaf_val)
 
+class EncodeStats(object):
+    """ How well the last `EncodeStream.encode` did, and where its time went.
+
+        Entropies and code lengths are in bits per symbol; sizes are bytes.
+
+        Everything but actual_size and the pack timing is measured before
+        packing, so it is there even when `encode` raises because some
+        symbols have no code (ones the sample missed, and 0, which
+        HuffmanTree._get_leaves skips). Those are counted in
+        uncoded_symbols and left out of full_avg_code_length.
+
+        expected_size models `_pack_input`'s framing: 7 code bits per
+        output byte behind a marker bit, and never less than one byte.
+    """
+    PHASES = ("count", "sort", "build", "map", "pack")
+
+    def __init__(self):
+        self.timings = {}
+        self.sample_size = 1.00
+        self.symbols = 0
+        self.distinct_symbols = 0
+        self.sample_entropy = 0.0
+        self.avg_code_length = 0.0
+        self.max_code_length = 0
+        self.full_avg_code_length = 0.0
+        self.sampling_cost_ratio = 1.0
+        self.uncoded_symbols = 0
+        self.expected_size = 0
+        self.actual_size = 0
+
+    def time_phase(self, phase, start):
+        """ record the time since `start` against `phase`, returning now """
+        now = time.perf_counter()
+        self.timings[phase] = now - start
+        return now
+
+    def measure(self, huffbytes, tree, stream, sample_size):
+        """ fill in everything but the timings and actual_size
+
+            huffbytes - the sampled HuffBytes the tree was built from
+            tree - the HuffmanTree, with its mapping built
+            stream - the raw stream
+        """
+        lengths = tree.code_lengths()
+        self.sample_size = sample_size
+        self.symbols = len(stream)
+        self.distinct_symbols = len(huffbytes)
+
+        total = sum(hb.frequency for hb in huffbytes) or 1
+        self.sample_entropy = -sum((hb.frequency / total) * math.log2(hb.frequency / total)
+                                   for hb in huffbytes if hb.frequency)
+        coded = [hb for hb in huffbytes if hb.value in lengths]
+        coded_total = sum(hb.frequency for hb in coded) or 1
+        self.avg_code_length = sum(lengths[hb.value] * hb.frequency / coded_total
+                                   for hb in coded)
+        self.max_code_length = max(lengths.values(), default=0)
+
+        # how the sampled codes fare over the whole stream
+        counts = Counter(stream)
+        coded_bits = sum(lengths[k] * n for k, n in counts.items() if k in lengths)
+        self.uncoded_symbols = sum(n for k, n in counts.items() if k not in lengths)
+        self.full_avg_code_length = self.avg_code_length
+        if (len(stream) > self.uncoded_symbols):
+            self.full_avg_code_length = coded_bits / (len(stream) - self.uncoded_symbols)
+
+        if (self.avg_code_length):
+            self.sampling_cost_ratio = self.full_avg_code_length / self.avg_code_length
+        self.expected_size = max(1, int(math.ceil(coded_bits / 7)))
+
+    def to_dict(self):
+        d = dict(self.__dict__)
+        d["timings"] = dict(self.timings)
+        return d
+
+    def to_json(self):
+        import json
+        return json.dumps(self.to_dict(), sort_keys=True)
+
 class EncodeStream(object):
     def __init__(self):
         self._raw_stream = bytearray()
         self._encoded_stream = bytearray()
         self._huffman_tree = HuffmanTree()
+        self._stats = EncodeStats()
+
+    @property
+    def stats(self):
+        """ EncodeStats for the last call to `encode` """
+        return self._stats
 
     @property
     def raw_stream(self):
@@ -276,12 +366,26 @@ class EncodeStream(object):
         self._encoded_stream = stream
 
     def encode(self, sample_size=1.00):
+        stats = EncodeStats()
+        t = time.perf_counter()
         huffbytes = build_huffByte_freqs(self.raw_stream, sample_size)
+        t = stats.time_phase("count", t)
         node_list = huffBytes_to_Nodes(huffbytes)
         node_list = sort_NodeList(node_list)
+        t = stats.time_phase("sort", t)
         self._huffman_tree = build_huffman_tree(node_list)
+        t = stats.time_phase("build", t)
         self._huffman_tree.tree_to_mapping()
+        t = stats.time_phase("map", t)
+
+        # measured first, so the stats explain a failed pack too
+        stats.measure(huffbytes, self._huffman_tree, self.raw_stream, sample_size)
+        self._stats = stats
+
+        t = time.perf_counter()
         self.encoded_stream = self._pack_input(self.raw_stream, self._huffman_tree.mapping)
+        stats.time_phase("pack", t)
+        stats.actual_size = len(self.encoded_stream)
 
     def decode(self, mapping):
         self._huffman_tree.mapping = mapping
@@ -297,8 +401,9 @@ class EncodeStream(object):
         while stream or in_byte:
 
             if (not in_byte and mapping.get(stream[0], None) is None):
-                output.append(stream[0])
-                stream = stream[1:]
+                # the packed format has no way to mark a raw byte
+                raise ValueError("no code for byte {}; it is missing from the sample, "
+                                 "or is 0".format(stream[0]))
 
             elif (not in_byte):
                 in_byte = mapping.get(stream[0], None).encoded_value
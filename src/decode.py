@@ -0,0 +1,207 @@
+"""
+Decode a PNG's image data into raw (unfiltered) scanlines.
+
+Rows are inflated and unfiltered in order, a bounded amount at a time
+(at most filters.UNFILTER_BLOCK rows), so asking for a band of rows stops
+inflating once the last one is reached, and downscaled output never holds
+more than `scale` full rows beyond that block.
+"""
+
+
+import zlib
+
+import numpy as np
+
+import chunks
+import filters
+import parse_png
+import tracing
+
+
+# most bytes inflated in one go
+INFLATE_CHUNK = 2**16
+
+SCALES = (1, 2, 4, 8)
+
+
+def read_header(data):
+    """ Returns (IHDR fields, iterator over IDAT data) for a whole PNG """
+    it = chunks.iter_chunks(data)
+    first = next(it, None)
+    if (not isinstance(first, chunks.IHDRChunk)):
+        raise ValueError("no IHDR")
+
+    header = first.fields()
+    if (header["interlace_method"]):
+        raise ValueError("interlaced PNGs are not supported")
+
+    idat = (c.data for c in it if c.type_code == b"IDAT")
+    return header, idat
+
+def _iter_filtered_rows(idat, row_len):
+    """ yield each filtered scanline (filter byte first) as the IDAT data
+        is inflated, never inflating more than INFLATE_CHUNK ahead. Corrupt
+        data raises ValueError, as the other decode errors do
+    """
+    inflater = zlib.decompressobj()
+    buf = bytearray()
+    for piece in idat:
+        while piece:
+            try:
+                with tracing.span("inflate") as span:
+                    buf += inflater.decompress(piece, INFLATE_CHUNK)
+                    span.nbytes = len(piece) - len(inflater.unconsumed_tail)
+            except zlib.error as e:
+                raise ValueError("corrupt image data: {}".format(e))
+            piece = inflater.unconsumed_tail
+            while len(buf) >= row_len:
+                yield bytes(buf[:row_len])
+                del buf[:row_len]
+
+    try:
+        with tracing.span("inflate"):
+            buf += inflater.flush()
+    except zlib.error as e:
+        raise ValueError("corrupt image data: {}".format(e))
+    while len(buf) >= row_len:
+        yield bytes(buf[:row_len])
+        del buf[:row_len]
+
+def iter_rows(data, start=0, stop=None):
+    """ Yields (IHDR fields, y, row) for each raw scanline y in [start, stop),
+        row being a uint8 array of the unfiltered bytes
+
+        data
+            @type - bytes
+            @param - a whole PNG file
+
+        Rows above `start` still have to be inflated and unfiltered (each row
+        depends on the one before), but nothing after `stop` is touched.
+    """
+    header, idat = read_header(data)
+    height = header["height"]
+    stop = height if stop is None else min(stop, height)
+    stride = filters.row_stride(header["width"], header["bit_depth"], header["color_type"])
+    bpp = filters.bytes_per_pixel(header["bit_depth"], header["color_type"])
+
+    if (start >= stop):
+        return
+
+    prev = np.zeros(stride, dtype=np.uint8)
+    y = 0
+    block = []
+    for filtered in _iter_filtered_rows(idat, stride + 1):
+        block.append(filtered)
+        if (len(block) < filters.UNFILTER_BLOCK and y + len(block) < stop):
+            continue
+
+        # rows are undone a block at a time, never reaching past `stop`
+        raw = _unfilter_block(block, prev, stride, bpp)
+        block = []
+        prev = raw[-1]
+        for row in raw:
+            if (y >= start):
+                yield header, y, row
+            y += 1
+
+        if (y >= stop):
+            return
+
+    # the data ran out mid-block: what rows there are still come out
+    for row in (_unfilter_block(block, prev, stride, bpp) if block else ()):
+        if (y >= start):
+            yield header, y, row
+        y += 1
+
+    if (y < stop):
+        raise ValueError("image data ends at row {} of {}".format(y, height))
+
+def _unfilter_block(block, prev, stride, bpp):
+    """ raw rows for a list of filtered scanlines (filter byte first) """
+    rows = np.frombuffer(b"".join(block), dtype=np.uint8).reshape(len(block), stride + 1)
+    with tracing.span("unfilter", len(block) * stride):
+        return filters.unfilter_rows(rows[:, 0], rows[:, 1:], prev, bpp)
+
+def decode_rows(data, start=0, stop=None):
+    """ Returns (IHDR fields, rows), rows being a uint8 array of the raw
+        scanlines [start, stop) shaped (rows, stride)
+
+        Interlaced images are not supported and raise ValueError, as does
+        corrupt or truncated image data.
+    """
+    header = None
+    rows = []
+    for header, y, row in iter_rows(data, start, stop):
+        rows.append(row)
+
+    if (header is None):
+        header, _ = read_header(data)
+        stride = filters.row_stride(header["width"], header["bit_depth"], header["color_type"])
+        return header, np.empty((0, stride), dtype=np.uint8)
+
+    return header, np.stack(rows)
+
+def decode_scaled(data, scale, start=0, stop=None):
+    """ Returns (IHDR fields, pixels) where pixels is the image (or rows
+        [start, stop) of it) shrunk by `scale` in each direction, shaped
+        (rows, columns, channels)
+
+        scale
+            @type - int
+            @param - 1, 2, 4 or 8
+
+        Each output pixel is the mean of a scale x scale block (blocks at the
+        right and bottom edges may be smaller). Palette images take the
+        block's top left index instead, since indices can't be averaged.
+        Samples stay uint8 or native-endian uint16; bit depths under 8 come
+        back as unscaled uint8 sample values, as `samples.unpack_rows` gives.
+    """
+    if (scale not in SCALES):
+        raise ValueError("scale must be one of {}, you passed : {}".format(SCALES, scale))
+
+    header = None
+    out = []
+    block = []
+    for header, y, row in iter_rows(data, start, stop):
+        block.append(_row_samples(row, header))
+        if (len(block) == scale):
+            out.append(_shrink_block(block, scale, header["color_type"]))
+            block = []
+
+    if (block):
+        out.append(_shrink_block(block, scale, header["color_type"]))
+
+    if (header is None):
+        header, _ = read_header(data)
+        channels = filters.CHANNELS[header["color_type"]]
+        return header, np.empty((0, -(-header["width"] // scale), channels), dtype=np.uint8)
+
+    return header, np.stack(out)
+
+def _row_samples(row, header):
+    """ a raw scanline as (width, channels) samples """
+    channels = filters.CHANNELS[header["color_type"]]
+    if (header["bit_depth"] == 8):
+        return row.reshape(-1, channels)
+    if (header["bit_depth"] == 16):
+        return row.view(">u2").astype(np.uint16).reshape(-1, channels)
+
+    # samples imports this module
+    from samples import unpack_rows
+    return unpack_rows(row[None], header["width"], header["bit_depth"], channels)[0]
+
+def _shrink_block(block, scale, color_type):
+    """ reduce up to `scale` rows of (width, channels) samples to one row """
+    if (color_type == 3):
+        return block[0][::scale]
+
+    rows = np.stack(block).astype(np.uint32)
+    width = rows.shape[1]
+    starts = np.arange(0, width, scale)
+    sums = np.add.reduceat(rows.sum(axis=0), starts, axis=0)
+    counts = np.minimum(scale, width - starts) * len(block)
+    return (sums // counts[:, None]).astype(block[0].dtype)
+
+def decode_file(filepath, start=0, stop=None):
+    """ `decode_rows` for a file on disk """
+    return decode_rows(parse_png.open_file(filepath), start, stop)
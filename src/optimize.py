@@ -0,0 +1,370 @@
+"""
+Losslessly shrink PNGs: strip ancillary chunks, reduce the color type and
+bit depth where no pixel changes, then re-filter and re-deflate under
+several settings in parallel and keep the smallest.
+
+    python optimize.py in.png out.png
+"""
+
+
+import os
+import sys
+import stat
+import json
+import struct
+import time
+import zlib
+
+import numpy as np
+
+import chunks
+import decode
+import filters
+import samples
+
+
+# ancillary chunks kept by default: they change how pixels are displayed
+KEEP_DEFAULT = (b"gAMA", b"cHRM", b"sRGB", b"iCCP", b"pHYs")
+
+# only valid for the original color type / bit depth
+COLOR_DEPENDENT = (b"bKGD", b"hIST", b"sBIT")
+
+# describe color, so a grey image needs grey ones or none
+COLOR_PROFILE = (b"iCCP", b"cHRM")
+
+# must come before PLTE when there is one
+BEFORE_PLTE = (b"gAMA", b"cHRM", b"sRGB", b"iCCP", b"sBIT")
+
+FILTER_STRATEGIES = ("none", "paeth", "min_sum", "entropy")
+LEVELS = (9,)
+ZLIB_STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED)
+
+# samples per pixel -> color type, for non-palette images
+COLOR_TYPES = {1 : 0, 2 : 4, 3 : 2, 4 : 6}
+
+
+def optimize_png(data, keep=KEEP_DEFAULT, filter_strategies=FILTER_STRATEGIES,
+                 levels=LEVELS, zlib_strategies=ZLIB_STRATEGIES, workers=None):
+    """ Returns (png bytes, report). The output is never larger than `data`;
+        if nothing helps, `data` itself is returned
+
+        data
+            @type - bytes
+            @param - a whole PNG file
+
+        keep
+            @type - iterable of bytes
+            @param - ancillary chunk types to carry over. Everything else
+                     ancillary is dropped
+
+        filter_strategies, levels, zlib_strategies
+            @type - iterables
+            @param - every combination is tried for every candidate
+                     color type, see `filters.STRATEGIES`
+
+        workers
+            @type - int
+            @param - process pool size, default one per CPU. 0 runs the
+                     trials in this process
+
+        Interlaced images can't be decoded yet; they come back untouched
+        with "skipped" : "interlaced" in the report.
+    """
+    start = time.perf_counter()
+    keep = set(keep)
+    header = None
+    palette = trns = None
+    before, after, stripped = [], [], []
+    seen_idat = False
+    for chunk in chunks.iter_chunks(data):
+        code = chunk.type_code
+        if (code == b"IHDR"):
+            header = chunk.fields()
+        elif (code == b"PLTE"):
+            palette = bytes(chunk.data)
+        elif (code == b"tRNS"):
+            trns = bytes(chunk.data)
+        elif (code == b"IDAT"):
+            seen_idat = True
+        elif (code != b"IEND" and code in keep):
+            (after if seen_idat else before).append((code, bytes(chunk.data)))
+        elif (code != b"IEND"):
+            stripped.append(chunk.type)
+
+    if (header is not None and header["interlace_method"]):
+        return data, {
+            "original_bytes" : len(data),
+            "optimized_bytes" : len(data),
+            "saved_bytes" : 0,
+            "color_type" : header["color_type"],
+            "bit_depth" : header["bit_depth"],
+            "filter" : None,
+            "level" : None,
+            "zlib_strategy" : None,
+            "stripped" : [],
+            "trials" : 0,
+            "skipped" : "interlaced",
+            "seconds" : time.perf_counter() - start,
+        }
+
+    header, rows = decode.decode_rows(data)
+    candidates = _candidates(header, rows, palette, trns)
+
+    tasks = []
+    for i, rep in enumerate(candidates):
+        for strategy in filter_strategies:
+            tasks.append((i, rep["rows"], rep["bpp"], strategy, levels, zlib_strategies))
+
+    if (workers == 0):
+        results = [_trial(*t) for t in tasks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_trial, *zip(*tasks)))
+
+    # PLTE and tRNS count against an indexed candidate
+    extra = [_side_chunk_bytes(rep) for rep in candidates]
+    size, i, strategy, level, zstrategy, idat = min(results, key=lambda r : (r[0] + extra[r[1]], r[1]))
+    rep = candidates[i]
+
+    if (rep is not candidates[0]):
+        # bKGD etc. describe the old color type, and an RGB profile is
+        # invalid once the image is grey
+        drop = COLOR_DEPENDENT
+        if (header["color_type"] in (2, 3, 6) and rep["color_type"] in (0, 4)):
+            drop += COLOR_PROFILE
+        stripped += [c.decode("latin-1") for c, d in before + after if c in drop]
+        before = [(c, d) for c, d in before if c not in drop]
+        after = [(c, d) for c, d in after if c not in drop]
+
+    out = _assemble(header, rep, idat, before, after)
+    report = {
+        "original_bytes" : len(data),
+        "optimized_bytes" : min(len(out), len(data)),
+        "saved_bytes" : max(0, len(data) - len(out)),
+        "color_type" : rep["color_type"],
+        "bit_depth" : rep["bit_depth"],
+        "filter" : strategy,
+        "level" : level,
+        "zlib_strategy" : zstrategy,
+        "stripped" : stripped,
+        "trials" : len(tasks) * len(levels) * len(zlib_strategies),
+    }
+
+    if (len(out) >= len(data)):
+        # nothing helped: hand back the input untouched
+        out = data
+        report.update({
+            "color_type" : header["color_type"],
+            "bit_depth" : header["bit_depth"],
+            "filter" : None,
+            "level" : None,
+            "zlib_strategy" : None,
+            "stripped" : [],
+        })
+
+    report["seconds"] = time.perf_counter() - start
+    return out, report
+
+def optimize_file(filepath, out_path=None, **kwargs):
+    """ `optimize_png` a file on disk, writing to `out_path` (default: in
+        place). Returns the report with "path" added
+
+        The output is written to a temp file beside it and renamed over,
+        so a crash or full disk leaves the old file whole. In place, a file
+        nothing could shrink isn't rewritten at all
+    """
+    with open(filepath, "rb") as f:
+        data = f.read()
+
+    out, report = optimize_png(data, **kwargs)
+    out_path = out_path or filepath
+    if (report["saved_bytes"] or not os.path.exists(out_path)
+            or not os.path.samefile(out_path, filepath)):
+        _replace_file(out_path, out)
+
+    report["path"] = filepath
+    return report
+
+def _replace_file(path, data):
+    """ atomically write `data` to `path`, keeping the mode of the file it
+        replaces (or the one open() would give a new file)
+    """
+    import tempfile
+
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mask = os.umask(0)
+        os.umask(mask)
+        mode = 0o666 & ~mask
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        if (os.path.exists(tmp)):
+            os.remove(tmp)
+        raise
+
+
+def _trial(i, rows, bpp, strategy, levels, zlib_strategies):
+    """ filter once, deflate under each setting, return the smallest as
+        (size, candidate index, strategy, level, zlib strategy, idat)
+    """
+    filtered = filters.filter_image(rows, bpp, strategy)
+    best = None
+    for level in levels:
+        for zstrategy in zlib_strategies:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 15, 9, zstrategy)
+            idat = compressor.compress(filtered) + compressor.flush()
+            if (best is None or len(idat) < best[0]):
+                best = (len(idat), i, strategy, level, zstrategy, idat)
+
+    return best
+
+def _candidates(header, rows, palette, trns):
+    """ Ways to store the image without changing a pixel, the original first.
+        Each is a dict of color_type, bit_depth, rows, bpp, palette, trns
+    """
+    ct, bd = header["color_type"], header["bit_depth"]
+    original = _rep(ct, bd, rows, palette, trns)
+
+    # sub-byte grey is already small, and a color key would have to be
+    # carried through every reduction; leave both alone
+    if ((bd < 8 and ct != 3) or (trns is not None and ct in (0, 2))):
+        return [original]
+
+    pixels = samples.unpack_rows(rows, header["width"], bd, filters.CHANNELS[ct])
+    if (ct == 3):
+        layout = "RGB8" if trns is None else "RGBA8"
+        pixels = samples.to_layout(pixels, ct, bd, layout, palette, trns)
+    else:
+        pixels = pixels.astype(np.uint8 if bd == 8 else np.uint16)
+
+    pixels = _reduce(pixels)
+    out = [original]
+    direct = _direct_rep(pixels)
+    if ((direct["color_type"], direct["bit_depth"]) != (ct, bd) or ct == 3):
+        out.append(direct)
+
+    indexed = _palette_rep(pixels)
+    if (indexed is not None and ct != 3):
+        out.append(indexed)
+    elif (indexed is not None and len(indexed["palette"]) < len(palette)):
+        out.append(indexed)
+
+    return out
+
+def _reduce(pixels):
+    """ drop 16 bit precision, alpha and color where the pixels don't use them """
+    if (pixels.dtype == np.uint16 and not (pixels % 257).any()):
+        pixels = (pixels // 257).astype(np.uint8)
+
+    channels = pixels.shape[-1]
+    top = np.iinfo(pixels.dtype).max
+    if (channels in (2, 4) and (pixels[..., -1] == top).all()):
+        pixels = pixels[..., :-1]
+        channels -= 1
+
+    if (channels >= 3):
+        rgb = pixels[..., :3]
+        if ((rgb[..., 0] == rgb[..., 1]).all() and (rgb[..., 1] == rgb[..., 2]).all()):
+            pixels = np.delete(pixels, [1, 2], axis=-1)
+
+    return np.ascontiguousarray(pixels)
+
+def _direct_rep(pixels):
+    height = pixels.shape[0]
+    bd = 16 if pixels.dtype == np.uint16 else 8
+    if (bd == 16):
+        rows = pixels.astype(">u2").reshape(height, -1).view(np.uint8)
+    else:
+        rows = pixels.reshape(height, -1)
+    return _rep(COLOR_TYPES[pixels.shape[-1]], bd, rows)
+
+def _palette_rep(pixels):
+    """ an indexed version, if the image has 256 colors or fewer """
+    if (pixels.dtype != np.uint8):
+        return None
+
+    height, width, channels = pixels.shape
+    flat = pixels.reshape(-1, channels)
+    colors, indices = np.unique(flat, axis=0, return_inverse=True)
+    if (len(colors) > 256):
+        return None
+
+    has_alpha = channels in (2, 4)
+    rgba = np.empty((len(colors), 4), dtype=np.uint8)
+    rgba[:, :3] = colors[:, :1] if channels <= 2 else colors[:, :3]
+    rgba[:, 3] = colors[:, -1] if has_alpha else 255
+
+    # translucent entries first, so tRNS can stop at the last of them
+    order = np.argsort(rgba[:, 3] == 255, kind="stable")
+    rgba = rgba[order]
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    indices = remap[indices.reshape(-1)].astype(np.uint8).reshape(height, width)
+
+    n_translucent = int((rgba[:, 3] < 255).sum())
+    trns = rgba[:n_translucent, 3].tobytes() if n_translucent else None
+
+    bd = 8
+    for depth in (1, 2, 4):
+        if (len(rgba) <= 1 << depth):
+            bd = depth
+            break
+
+    return _rep(3, bd, _pack_indices(indices, bd), rgba[:, :3].tobytes(), trns)
+
+def _pack_indices(indices, bit_depth):
+    """ (height, width) indices packed into scanlines of `bit_depth` bits """
+    if (bit_depth == 8):
+        return indices
+
+    height, width = indices.shape
+    per_byte = 8 // bit_depth
+    padded = np.zeros((height, -(-width // per_byte) * per_byte), dtype=np.uint8)
+    padded[:, :width] = indices
+    shifts = np.arange(8 - bit_depth, -1, -bit_depth).astype(np.uint8)
+    grouped = padded.reshape(height, -1, per_byte) << shifts
+    return np.bitwise_or.reduce(grouped, axis=-1).astype(np.uint8)
+
+def _rep(color_type, bit_depth, rows, palette=None, trns=None):
+    return {
+        "color_type" : color_type,
+        "bit_depth" : bit_depth,
+        "rows" : np.ascontiguousarray(rows),
+        "bpp" : filters.bytes_per_pixel(bit_depth, color_type),
+        "palette" : palette,
+        "trns" : trns,
+    }
+
+def _side_chunk_bytes(rep):
+    size = 0
+    for data in (rep["palette"], rep["trns"]):
+        if (data is not None):
+            size += len(data) + 12
+    return size
+
+def _assemble(header, rep, idat, before, after):
+    ihdr = struct.pack(">IIBBBBB", header["width"], header["height"],
+                       rep["bit_depth"], rep["color_type"], 0, 0, 0)
+    out = [chunks.PNG_SIGNATURE, chunks.pack_chunk(b"IHDR", ihdr)]
+    out += [chunks.pack_chunk(c, d) for c, d in before if c in BEFORE_PLTE]
+    if (rep["palette"] is not None):
+        out.append(chunks.pack_chunk(b"PLTE", rep["palette"]))
+    if (rep["trns"] is not None):
+        out.append(chunks.pack_chunk(b"tRNS", rep["trns"]))
+    out += [chunks.pack_chunk(c, d) for c, d in before if c not in BEFORE_PLTE]
+    out.append(chunks.pack_chunk(b"IDAT", idat))
+    out += [chunks.pack_chunk(c, d) for c, d in after]
+    out.append(chunks.pack_chunk(b"IEND"))
+    return b"".join(out)
+
+
+if __name__ == "__main__":
+    print(json.dumps(optimize_file(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)))
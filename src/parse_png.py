@@ -5,129 +5,44 @@ working file
 
 import os, sys
 import binascii
+import zlib
 
-
-# Don't think I'll need this...
-# class PNGChunk(object):
-#     def __init__(self):
-#         self._length = int()
-#         self._hex_data = str()
-#         self._bin_data = str()
-#         self._crc = str()
-#
-#     @property
-#     def length(self):
-#         return self._length
-#
-#     @length.setter
-#     def length(self, val):
-#         self.check_type(val, int)
-#         self._length = val
-#
-#     @property
-#     def hex_data(self):
-#         return self._hex_data
-#
-#     @hex_data.setter
-#     def hex_data(self, val):
-#         self.check_type(val, str)
-#         self._hex_data = val
-#
-#     @property
-#     def bin_data(self):
-#         return self._bin_data
-#
-#     @bin_data.setter
-#     def bin_data(self, val):
-#         check_type(val, str)
-#         self._bin_data = val
-#
-#     @property
-#     def crc(self):
-#         return self._crc
-#
-#     @crc.setter
-#     def crc(self, val):
-#         check_type(val, str)
-#         self._crc = val
-#
-#     def check_type(self, val, ought):
-#         if (isinstance(val, ought)):
-#             return True
-#
-#         raise TypeError("""
-#                             Required type : {}
-#                             You passed type : {}
-#                             You passed value : {}
-#                         """.format(ought, val, type(val))
-#
-# class IHDRChunk(PNGChunk):
-#     def __init__(self):
-#
-#
-#
-# class PNGFile(object):
-#     def __init__(self):
-#         self._filepath = str()
-#         self._width = int()
-#         self._height = int()
-#         self._bit_depth = int()
-#         self._color_type = int()
-#         self._compression_method = int()
-#
+import chunks
+import tracing
 
 
+@tracing.traced("read", lambda args, data : len(data))
 def open_file(filepath):
     if (os.path.isfile(filepath) is False): raise ValueError()
 
-    return open(filepath, "r+").read()
+    with open(filepath, "rb") as f:
+        return f.read()
 
+@tracing.traced("signature", lambda args, r : len(args[0][:8]))
 def is_png(data):
     first_eight = data[:8]
-    PNG_id = "89 50 4e 47 0d 0a 1a 0a".replace("0x", "").lower()
-    if (binascii.hexlify(first_eight) == PNG_id):
+    PNG_id = "89 50 4e 47 0d 0a 1a 0a".replace(" ", "").lower()
+    if (binascii.hexlify(first_eight).decode("ascii") == PNG_id):
         return True
     return False
 
 def type_to_eng(type_hex):
+    """ the name of a known chunk type given as hex, e.g. "49484452" -> "IHDR" """
     try:
-        int(type_hex, 16)
-    except ValueError:
+        type_code = binascii.unhexlify(type_hex.replace("0x", ""))
+    except (binascii.Error, ValueError):
         raise TypeError("type_to_eng requires hex, you pass : {}".format(type_hex))
 
-    type_hex = type_hex.replace("0x", "").lower()
-
-    mapping = {
-        "49484452" : "IHDR",
-        "504c5445" : "PLTE",
-        "49444154" : "IDAT",
-        "49454e44" : "IEND",
-        "74524e53" : "tRNS",
-        "8348524d" : "cHRM",
-        "67414d41" : "gAMA",
-        "69434350" : "iCCP",
-        "73424954" : "sBIT",
-        "73524742" : "sRGB",
-        "74455874" : "tEXt",
-        "7a545874" : "zTXt",
-        "69545874" : "iTXt",
-        "624b4744" : "bKGD",
-        "68495354" : "hIST",
-        "70485973" : "pHYs",
-        "73504c54" : "sPLT",
-        "74494d45" : "tIME",
-    }
-
-    return mapping.get(type_hex, None)
+    return chunks.chunk_name(type_code)
 
 
+@tracing.traced("chunks", lambda args, r : len(args[0]))
 def break_into_chunks(data):
     # TODO : consider using a buffer or StringIO
 
     # PNG's begin with an identifier. If this has not yet been stripped,
     # we should remove it
-    PNG_id = "89 50 4e 47 0d 0a 1a 0a".replace(" " , "")
-    if (binascii.hexlify(data[:8]) == PNG_id):
+    if (is_png(data)):
         data = data[8:]
 
     png = {}
@@ -143,21 +58,21 @@ def break_into_chunks(data):
 
         # CHUNK TYPE
         # Second four bytes specify the type of chunk_len
-        chunk_type = data[:4]
-        chunk_type = binascii.hexlify(chunk_type)
+        raw_chunk_type = data[:4]
+        chunk_type = binascii.hexlify(raw_chunk_type).decode("ascii")
         data = data[4:]
 
         # CHUNK DATA
         # the next n bytes (where n = chunk_len) are the actual data of the
         # chunk. If chunk_len = 0, this doesn't exist
         raw_chunk_data = data[:chunk_len]
-        hex_chunk_data = binascii.hexlify(raw_chunk_data)
+        hex_chunk_data = binascii.hexlify(raw_chunk_data).decode("ascii")
         data = data[chunk_len:]
 
         # CHUNK CRC
         # the next 4 bytes are the cyclic redundancy code (CRC)
         chunk_CRC = data[:4]
-        chunk_CRC = binascii.hexlify(chunk_CRC)
+        chunk_CRC = binascii.hexlify(chunk_CRC).decode("ascii")
         data = data[4:]
 
         png[chunk_type] = {
@@ -165,11 +80,12 @@ def break_into_chunks(data):
             "data" : hex_chunk_data,
             "raw_data" : raw_chunk_data,
             "crc" : chunk_CRC,
-            "type" : type_to_eng(chunk_type)
+            "type" : chunks.chunk_name(raw_chunk_type)
         }
 
     return png
 
+@tracing.traced("IHDR", lambda args, r : len(args[0]) // 2)
 def process_IHDR(hex_str):
     hex_str = hex_str.replace(" ", "").strip()
 
@@ -219,30 +135,59 @@ def process_IHDR(hex_str):
         "interlace_method" : int(interlace_method, 16),
     }
 
+# signature (8) + IHDR length (4), type (4), data (13) and CRC (4)
+HEADER_LENGTH = 33
+
+def parse_header(data):
+    """ Returns the decoded IHDR from the start of a PNG, or None if `data`
+        is too short to tell yet. Raises ValueError as soon as the bytes
+        seen so far can't be a PNG, so it can be retried as data arrives.
+
+        data
+            @type - bytes
+            @param - a prefix of the file, of any length
+    """
+    PNG_id = binascii.unhexlify("89504e470d0a1a0a")
+    if (not PNG_id.startswith(data[:8])):
+        raise ValueError("bad png signature")
+
+    if (len(data) >= 16 and data[8:16] != binascii.unhexlify("0000000d49484452")):
+        raise ValueError("first chunk must be a 13 byte IHDR")
+
+    if (len(data) < HEADER_LENGTH):
+        return None
+
+    crc = int(binascii.hexlify(data[29:33]), 16)
+    if (zlib.crc32(data[12:29]) != crc):
+        raise ValueError("IHDR CRC mismatch")
+
+    return process_IHDR(binascii.hexlify(data[16:29]).decode("ascii"))
+
+@tracing.traced("IDAT", lambda args, r : len(args[0]) // 2)
 def process_IDAT(hex_str):
 
     # Compression Method
     # 1 byte
     # "8" indicates "DEFLATE" compression
     compression_method = hex_str[:2]
-    hex_str[2:]
+    hex_str = hex_str[2:]
 
     # Additional Flag
     # 1 byte
     # for compression_method = 8:
     # addl_flag = log2(LZ77 window size) - 8
     addl_flag = hex_str[:2]
-    hex_str[2:]
+    hex_str = hex_str[2:]
 
     # Compressed Data Blocks
     # n bytes
-    data_blocks = hex_str[:-4]
-    hex_str = [-4:]
+    data_blocks = hex_str[:-8]
+    hex_str = hex_str[-8:]
 
     # Check Value
     # 4 bytes
-    check_value = hex_str[:4]
-    hex_str = hex_str[4:]
+    check_value = hex_str[:8]
+    hex_str = hex_str[8:]
 
     return {
         "compression_method" : int(compression_method, 16),
@@ -251,12 +196,156 @@ def process_IDAT(hex_str):
         "check_value" : check_value
     }
 
+def process_pHYs(hex_str):
+    # Pixels per unit, X axis then Y axis
+    # four bytes each
+    ppu_x = hex_str[:8]
+    ppu_y = hex_str[8:16]
+
+    # Unit Specifier
+    # 1 byte
+    # 0 is unknown (aspect ratio only), 1 is the meter
+    unit = hex_str[16:18]
+
+    return {
+        "ppu_x" : int(ppu_x, 16),
+        "ppu_y" : int(ppu_y, 16),
+        "unit" : int(unit, 16),
+    }
+
+def process_tIME(hex_str):
+    # Year is two bytes, everything after it one byte each
+    return {
+        "year" : int(hex_str[:4], 16),
+        "month" : int(hex_str[4:6], 16),
+        "day" : int(hex_str[6:8], 16),
+        "hour" : int(hex_str[8:10], 16),
+        "minute" : int(hex_str[10:12], 16),
+        "second" : int(hex_str[12:14], 16),
+    }
+
+def process_tEXt(hex_str):
+    # Keyword, null separator, then the text. Both are Latin-1
+    keyword, _, text = binascii.unhexlify(hex_str).partition(b"\x00")
+
+    return {
+        "keyword" : keyword.decode("latin-1"),
+        "text" : text.decode("latin-1"),
+    }
+
+def process_iTXt(hex_str):
+    return chunks.parse_iTXt(binascii.unhexlify(hex_str))
+
+METADATA_TYPES = ("IHDR", "pHYs", "tEXt", "iTXt", "tIME")
+
+METADATA_PROCESSORS = {
+    "IHDR" : process_IHDR,
+    "pHYs" : process_pHYs,
+    "tEXt" : process_tEXt,
+    "iTXt" : process_iTXt,
+    "tIME" : process_tIME,
+}
+
+def iter_chunk_headers(f):
+    """ Yields (offset, length, type) for each chunk of an open PNG file,
+        stopping after IEND or at end of file.
+
+        f
+            @type - file
+            @param - opened in binary mode, positioned just past the signature
+
+        When a chunk is yielded, `f` is positioned at the start of its data,
+        so the caller may read it. Either way the next chunk is found by
+        seeking, never by reading through the data.
+    """
+    offset = f.tell()
+    while True:
+        f.seek(offset)
+        header = f.read(8)
+        if (len(header) < 8):
+            return
+
+        # CHUNK LENGTH and CHUNK TYPE
+        # 4 bytes each
+        chunk_len = int(binascii.hexlify(header[:4]), 16)
+        chunk_name = header[4:].decode("latin-1")
+
+        yield (offset, chunk_len, chunk_name)
+
+        if (chunk_name == "IEND"):
+            return
+
+        # length + type + data + CRC
+        offset += chunk_len + 12
+
+def scan_chunks(filepath, types=METADATA_TYPES, stop_at_idat=False):
+    """ Walk a PNG's chunk headers, reading the bodies of `types` only and
+        seeking past everything else (IDAT in particular).
+
+        Returns a list of chunks in file order, as dicts with the keys
+        `break_into_chunks` uses plus "offset", the position of the chunk's
+        length field in the file. Unlike `break_into_chunks`, repeated chunk
+        types (e.g. several tEXt) are all kept.
+
+        filepath
+            @type - str
+            @param - path to the PNG
+
+        types
+            @type - iterable of str
+            @param - chunk types, e.g. "tEXt", whose data should be read
+
+        stop_at_idat
+            @type - bool
+            @param - stop at the first IDAT rather than walking to IEND.
+                     Ancillary chunks after the image data are then missed.
+    """
+    if (os.path.isfile(filepath) is False): raise ValueError()
+
+    found = []
+    with open(filepath, "rb") as f:
+        if (not is_png(f.read(8))):
+            raise ValueError("not a png : {}".format(filepath))
+
+        for offset, chunk_len, chunk_name in iter_chunk_headers(f):
+            if (chunk_name == "IDAT" and stop_at_idat):
+                break
+
+            # anything not asked for is never read: the walk seeks past it
+            if (chunk_name in types):
+                raw_chunk_data = f.read(chunk_len)
+                found.append({
+                    "offset" : offset,
+                    "length" : chunk_len,
+                    "data" : binascii.hexlify(raw_chunk_data).decode("ascii"),
+                    "raw_data" : raw_chunk_data,
+                    "crc" : binascii.hexlify(f.read(4)).decode("ascii"),
+                    "type" : chunk_name,
+                })
+
+    return found
+
+def read_metadata(filepath, stop_at_idat=False):
+    """ Returns the decoded metadata chunks of a PNG without reading its
+        image data, as {chunk type : decoded fields}. Text chunks may
+        repeat, so "tEXt" and "iTXt" map to lists.
+    """
+    metadata = {"tEXt" : [], "iTXt" : []}
+    for chunk in scan_chunks(filepath, METADATA_TYPES, stop_at_idat):
+        fields = METADATA_PROCESSORS[chunk["type"]](chunk["data"])
+        if (chunk["type"] in ("tEXt", "iTXt")):
+            metadata[chunk["type"]].append(fields)
+        else:
+            metadata[chunk["type"]] = fields
+
+    return metadata
+
 if __name__ == "__main__":
-    fp = "/Users/LukeGilson/misc_scripts/png/test_png_1px.png"
+    fp = sys.argv[1]
     data = open_file(fp)
     k = break_into_chunks(data)
     k["49484452"].update(process_IHDR(k["49484452"]["data"]))
     for i in k:
-        print "=== {} ===".format(i)
+        print("=== {} ===".format(i))
         for j in k[i]:
-            print "{} : {}".format(j, k[i][j])
+            print("{} : {}".format(j, k[i][j]))
@@ -0,0 +1,160 @@
+"""
+A push-style PNG chunk parser.
+
+Bytes go in with `feed` in whatever sizes they arrive; events come out. Only
+the 8 byte chunk header and 4 byte CRC are ever buffered, and chunk data is
+handed back as slices of the fed buffers, so memory use doesn't grow with
+chunk size. Meant to sit under sockets, pipes and decompressors.
+
+    parser = ChunkParser()
+    for block in iter(lambda : f.read(4096), b""):
+        for event in parser.feed(block):
+            ...
+    parser.close()
+"""
+
+
+import binascii
+import zlib
+
+
+# Events, as tuples whose first element is one of:
+#   (START, chunk_type, length) - a chunk header has been read
+#   (DATA, chunk_type, memoryview) - a piece of the chunk's data. Chunks may
+#                                    arrive in any number of pieces
+#   (END, chunk_type, crc_ok) - the CRC has been read and checked
+START = "start"
+DATA = "data"
+END = "end"
+
+# Parser states
+SIGNATURE = "signature"
+HEADER = "header"
+BODY = "body"
+CRC = "crc"
+DONE = "done"
+
+PNG_SIGNATURE = binascii.unhexlify("89504e470d0a1a0a")
+
+
+class ChunkParser(object):
+    def __init__(self, expect_signature=True):
+        """
+        expect_signature
+            @type - bool
+            @param - the stream starts with the 8 byte PNG signature. Pass
+                     False if it has already been stripped
+        """
+        self._state = SIGNATURE if expect_signature else HEADER
+        self._pending = bytearray() # partial signature, header or CRC
+        self._chunk_type = None
+        self._remaining = 0 # data bytes left in the current chunk
+        self._crc = 0
+        self._offset = 0
+        self._unused_data = b""
+
+    @property
+    def state(self):
+        """ what the parser expects next, one of the state constants """
+        return self._state
+
+    @property
+    def offset(self):
+        """ total bytes fed so far """
+        return self._offset
+
+    @property
+    def unused_data(self):
+        """ bytes fed after IEND, as zlib's decompressobj keeps them """
+        return self._unused_data
+
+    @property
+    def done(self):
+        """ True once IEND has been read """
+        return self._state == DONE
+
+    def feed(self, data):
+        """ Consume `data` and return the list of events it completes
+
+            data
+                @type - bytes-like
+                @param - the next bytes of the stream, any length. DATA
+                         events are views into it, so don't mutate it while
+                         they're in use
+
+            Raises ValueError on a bad signature, or when fed again after
+            IEND. Bytes following IEND in the same call are not parsed; the
+            events up to IEND are returned and the rest is `unused_data`.
+        """
+        view = memoryview(data)
+        if (self._state == DONE and view):
+            raise ValueError("{} bytes after IEND".format(len(view)))
+
+        self._offset += len(view)
+        events = []
+        while view:
+            if (self._state == BODY):
+                view = self._read_body(view, events)
+                continue
+
+            if (self._state == DONE):
+                self._unused_data = bytes(view)
+                break
+
+            view = self._fill(view)
+            if (len(self._pending) < self._wanted()):
+                break
+
+            self._complete(events)
+
+        return events
+
+    def close(self):
+        """ Signal the end of the stream. Raises ValueError if it stopped
+            part way through the file
+        """
+        if (self._state != DONE):
+            raise ValueError("stream ended in state {}".format(self._state))
+
+    def _wanted(self):
+        return {SIGNATURE : 8, HEADER : 8, CRC : 4}[self._state]
+
+    def _fill(self, view):
+        """ move bytes from `view` into _pending until it's complete """
+        take = self._wanted() - len(self._pending)
+        self._pending += view[:take]
+        return view[take:]
+
+    def _read_body(self, view, events):
+        piece = view[:self._remaining]
+        self._crc = zlib.crc32(piece, self._crc)
+        self._remaining -= len(piece)
+        events.append((DATA, self._chunk_type, piece))
+
+        if (not self._remaining):
+            self._state = CRC
+        return view[len(piece):]
+
+    def _complete(self, events):
+        """ act on a full signature, header or CRC in _pending """
+        pending = bytes(self._pending)
+        self._pending = bytearray()
+
+        if (self._state == SIGNATURE):
+            if (pending != PNG_SIGNATURE):
+                raise ValueError("bad png signature")
+            self._state = HEADER
+
+        elif (self._state == HEADER):
+            # CHUNK LENGTH and CHUNK TYPE
+            # 4 bytes each
+            self._remaining = int(binascii.hexlify(pending[:4]), 16)
+            self._chunk_type = pending[4:].decode("latin-1")
+            self._crc = zlib.crc32(pending[4:])
+            events.append((START, self._chunk_type, self._remaining))
+            self._state = BODY if self._remaining else CRC
+
+        elif (self._state == CRC):
+            crc_ok = (int(binascii.hexlify(pending), 16) == self._crc)
+            events.append((END, self._chunk_type, crc_ok))
+            self._state = DONE if self._chunk_type == "IEND" else HEADER
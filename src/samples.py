@@ -0,0 +1,193 @@
+"""
+Turn raw scanlines into arrays of samples in a chosen layout.
+
+Packed 1, 2 and 4 bit samples are split with a lookup table, palettes are
+applied by fancy indexing and 16 bit samples are read through a big-endian
+view, so no step does per-pixel work in Python.
+
+    pixels = load_array(fp, "RGBA8") # (height, width, 4) uint8
+"""
+
+
+import numpy as np
+
+import chunks
+import decode
+import filters
+import parse_png
+
+
+# layout : (channels, bit depth)
+LAYOUTS = {
+    "L8" : (1, 8),
+    "LA8" : (2, 8),
+    "RGB8" : (3, 8),
+    "RGBA8" : (4, 8),
+    "L16" : (1, 16),
+    "LA16" : (2, 16),
+    "RGB16" : (3, 16),
+    "RGBA16" : (4, 16),
+}
+
+
+def _unpack_table(bit_depth):
+    """ (256, 8 // bit_depth) table: byte value -> its samples, high bits first """
+    shifts = np.arange(8 - bit_depth, -1, -bit_depth)
+    mask = (1 << bit_depth) - 1
+    return ((np.arange(256)[:, None] >> shifts) & mask).astype(np.uint8)
+
+_UNPACK_TABLES = {d : _unpack_table(d) for d in (1, 2, 4)}
+
+
+def unpack_rows(rows, width, bit_depth, channels):
+    """ Returns the samples in `rows`, shaped (height, width, channels)
+
+        rows
+            @type - numpy.ndarray
+            @param - uint8 raw scanlines shaped (height, stride), as
+                     `decode.decode_rows` returns them
+
+        Bit depths under 8 come back as uint8 sample values (not scaled).
+        8 bit samples are a view of `rows`, and 16 bit samples are a
+        big-endian (">u2") view of it; neither copies.
+    """
+    height = rows.shape[0]
+    if (bit_depth == 8):
+        return rows[:, :width * channels].reshape(height, width, channels)
+
+    if (bit_depth == 16):
+        return rows[:, :width * channels * 2].view(">u2").reshape(height, width, channels)
+
+    try:
+        table = _UNPACK_TABLES[bit_depth]
+    except KeyError:
+        raise ValueError("bad bit depth : {}".format(bit_depth))
+
+    unpacked = table[rows].reshape(height, -1)
+    return unpacked[:, :width * channels].reshape(height, width, channels)
+
+def to_layout(samples, color_type, bit_depth, layout="RGBA8", palette=None, trns=None):
+    """ Returns a contiguous array shaped (height, width, channels) in
+        `layout`, one of LAYOUTS
+
+        samples
+            @type - numpy.ndarray
+            @param - as `unpack_rows` returns them
+
+        palette
+            @type - bytes-like
+            @param - PLTE data. Required for color type 3
+
+        trns
+            @type - bytes-like
+            @param - tRNS data, if any. Becomes the alpha channel
+
+        Color is reduced to grey with integer BT.601 weights when a grey
+        layout is asked for; depth is converted by scaling (x * 257 up,
+        x >> 8 down).
+    """
+    try:
+        want_channels, want_depth = LAYOUTS[layout]
+    except KeyError:
+        raise ValueError("unknown layout : {}".format(layout))
+
+    if (color_type == 3):
+        color, alpha, depth = _apply_palette(samples[..., 0], palette, trns)
+    else:
+        color, alpha, depth = _split_alpha(samples, color_type, bit_depth, trns)
+
+    if (want_channels <= 2 and color.shape[-1] == 3):
+        color = _to_grey(color)
+    elif (want_channels >= 3 and color.shape[-1] == 1):
+        color = np.repeat(color, 3, axis=-1)
+
+    color = _convert_depth(color, depth, want_depth)
+    if (want_channels in (1, 3)):
+        return np.ascontiguousarray(color)
+
+    if (alpha is None):
+        alpha = np.full(color.shape[:-1], (1 << want_depth) - 1, dtype=color.dtype)
+    else:
+        alpha = _convert_depth(alpha, depth, want_depth)
+
+    return np.concatenate((color, alpha[..., None]), axis=-1)
+
+def _apply_palette(indices, palette, trns):
+    if (palette is None):
+        raise ValueError("color type 3 needs a palette")
+
+    # pad to 256 entries so an out of range index reads black, not an error
+    lut = np.zeros((256, 3), dtype=np.uint8)
+    entries = np.frombuffer(bytes(palette), dtype=np.uint8).reshape(-1, 3)
+    lut[:len(entries)] = entries
+    color = lut[indices]
+
+    alpha = None
+    if (trns is not None):
+        alpha_lut = np.full(256, 255, dtype=np.uint8)
+        trns = np.frombuffer(bytes(trns), dtype=np.uint8)
+        alpha_lut[:len(trns)] = trns
+        alpha = alpha_lut[indices]
+
+    return color, alpha, 8
+
+def _split_alpha(samples, color_type, bit_depth, trns):
+    alpha = None
+    if (color_type in (4, 6)):
+        color, alpha = samples[..., :-1], samples[..., -1]
+    else:
+        color = samples
+
+    if (trns is not None and alpha is None):
+        # a single transparent color key, compared against the raw samples
+        key = np.frombuffer(bytes(trns), dtype=">u2")[:color.shape[-1]]
+        top = (1 << max(bit_depth, 8)) - 1
+        alpha = np.where((color == key).all(axis=-1), 0, top)
+
+    depth = 16 if bit_depth == 16 else 8
+    dtype = np.uint16 if depth == 16 else np.uint8
+    color = color.astype(dtype)
+    if (alpha is not None):
+        alpha = alpha.astype(dtype)
+
+    if (bit_depth < 8):
+        # 1, 2, 4 bit grey scaled to the full byte: 255, 85, 17
+        color = color * np.uint8(255 // ((1 << bit_depth) - 1))
+
+    return color, alpha, depth
+
+def _to_grey(color):
+    weights = np.array([299, 587, 114], dtype=np.uint32)
+    grey = (color.astype(np.uint32) @ weights + 500) // 1000
+    return grey.astype(color.dtype)[..., None]
+
+def _convert_depth(values, depth, want_depth):
+    if (depth == want_depth):
+        return values
+    if (want_depth == 16):
+        return values.astype(np.uint16) * np.uint16(257)
+    return (values >> 8).astype(np.uint8)
+
+
+def decode_array(data, layout="RGBA8", start=0, stop=None):
+    """ Returns (IHDR fields, pixels) for rows [start, stop) of a whole PNG,
+        pixels shaped (rows, width, channels) in `layout`
+    """
+    palette = trns = None
+    for chunk in chunks.iter_chunks(data):
+        if (chunk.type_code == b"PLTE"):
+            palette = chunk.data
+        elif (chunk.type_code == b"tRNS"):
+            trns = chunk.data
+        elif (chunk.type_code == b"IDAT"):
+            break
+
+    header, rows = decode.decode_rows(data, start, stop)
+    channels = filters.CHANNELS[header["color_type"]]
+    samples = unpack_rows(rows, header["width"], header["bit_depth"], channels)
+    pixels = to_layout(samples, header["color_type"], header["bit_depth"], layout, palette, trns)
+    return header, pixels
+
+def load_array(filepath, layout="RGBA8", start=0, stop=None):
+    """ `decode_array` for a file on disk """
+    return decode_array(parse_png.open_file(filepath), layout, start, stop)
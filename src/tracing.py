@@ -0,0 +1,214 @@
+"""
+Optional timing spans around the parse stages: read, signature, chunks,
+crc, IHDR, IDAT, inflate and unfilter.
+
+Nothing is timed unless a tracer is installed. A tracer is any callable
+taking (stage, seconds, nbytes); `Profiler` is one that aggregates the
+calls into per-stage totals and duration histograms.
+
+    with tracing.profile() as prof:
+        parse_png.break_into_chunks(parse_png.open_file(fp))
+    print(prof.to_json())
+
+The tracer is global to the process, so spans from every thread land in
+the same one; process pool workers each have their own.
+
+parse_png imports this, so it sticks to modules already loaded at startup.
+"""
+
+
+import time
+
+
+_tracer = None
+
+
+def set_tracer(tracer):
+    """ Install `tracer` (None to turn tracing off), returning the old one """
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    return previous
+
+def get_tracer():
+    return _tracer
+
+def tracing(tracer):
+    """ `tracer` is installed for the body of the with block """
+    return _Installed(tracer)
+
+def profile():
+    """ `tracing` with a fresh Profiler """
+    return tracing(Profiler())
+
+
+class _Installed(object):
+    __slots__ = ("tracer", "previous")
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def __enter__(self):
+        self.previous = set_tracer(self.tracer)
+        return self.tracer
+
+    def __exit__(self, *exc):
+        set_tracer(self.previous)
+        return False
+
+class _Span(object):
+    __slots__ = ("tracer", "stage", "nbytes", "start")
+
+    def __init__(self, tracer, stage, nbytes):
+        self.tracer = tracer
+        self.stage = stage
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer(self.stage, time.perf_counter() - self.start, self.nbytes)
+        return False
+
+class _NullSpan(object):
+    """ what `span` hands out while tracing is off. Shared, so setting
+        nbytes on it goes nowhere
+    """
+    __slots__ = ()
+
+    @property
+    def nbytes(self):
+        return 0
+
+    @nbytes.setter
+    def nbytes(self, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage, nbytes=0):
+    """ Returns a context manager timing its body as `stage`
+
+        stage
+            @type - str
+            @param - e.g. "inflate"
+
+        nbytes
+            @type - int
+            @param - bytes the stage works through. Can also be set on the
+                     span inside the with block, once it's known
+
+        While no tracer is installed this is one global lookup and a
+        shared no-op context manager.
+    """
+    if (_tracer is None):
+        return _NULL_SPAN
+    return _Span(_tracer, stage, nbytes)
+
+def traced(stage, size=None):
+    """ Decorator timing every call of a function as `stage`
+
+        size
+            @type - callable
+            @param - size(args, result) -> bytes processed by the call
+    """
+    def decorator(func):
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if (tracer is None):
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            tracer(stage, elapsed, size(args, result) if size else 0)
+            return result
+
+        # as functools.wraps, which isn't loaded yet at startup
+        for attr in ("__module__", "__name__", "__qualname__", "__doc__"):
+            setattr(wrapper, attr, getattr(func, attr))
+        wrapper.__wrapped__ = func
+        return wrapper
+    return decorator
+
+
+class Histogram(object):
+    """ Counts of durations in power of two buckets of microseconds. Bucket
+        n holds durations under 2**n us (and at least 2**(n-1) us)
+    """
+    def __init__(self):
+        self._buckets = {}
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def total(self):
+        return self._total
+
+    @property
+    def max(self):
+        return self._max
+
+    def add(self, seconds):
+        n = int(seconds * 1e6).bit_length()
+        self._buckets[n] = self._buckets.get(n, 0) + 1
+        self._count += 1
+        self._total += seconds
+        self._max = max(self._max, seconds)
+
+    def to_dict(self):
+        """ {"<{2**n}us" : count}, smallest bucket first """
+        return {"<{}us".format(2**n) : self._buckets[n] for n in sorted(self._buckets)}
+
+
+class Profiler(object):
+    """ A tracer aggregating spans per stage. Safe to share between threads """
+    def __init__(self):
+        self._stages = {}
+        import threading
+        self._lock = threading.Lock()
+
+    def __call__(self, stage, seconds, nbytes=0):
+        with self._lock:
+            try:
+                hist, total_bytes = self._stages[stage]
+            except KeyError:
+                hist, total_bytes = Histogram(), 0
+            hist.add(seconds)
+            self._stages[stage] = (hist, total_bytes + nbytes)
+
+    def clear(self):
+        with self._lock:
+            self._stages = {}
+
+    def to_dict(self):
+        """ {stage : {count, seconds, mean, max, bytes, histogram}} """
+        out = {}
+        with self._lock:
+            for stage, (hist, nbytes) in self._stages.items():
+                out[stage] = {
+                    "count" : hist.count,
+                    "seconds" : hist.total,
+                    "mean" : hist.total / hist.count,
+                    "max" : hist.max,
+                    "bytes" : nbytes,
+                    "histogram" : hist.to_dict(),
+                }
+        return out
+
+    def to_json(self):
+        import json
+        return json.dumps(self.to_dict(), sort_keys=True)
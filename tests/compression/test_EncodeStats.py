@@ -0,0 +1,85 @@
+import json
+import unittest
+from compression.huffman import EncodeStream, EncodeStats
+
+
+class TestEncodeStats(unittest.TestCase):
+
+    def encode(self, stream, sample_size=1.00):
+        es = EncodeStream()
+        es.raw_stream = bytearray(stream, "ascii")
+        es.encode(sample_size)
+        return es
+
+    def test_two_symbols(self):
+        stats = self.encode("abababab").stats
+        self.assertAlmostEqual(stats.sample_entropy, 1.0)
+        self.assertAlmostEqual(stats.avg_code_length, 1.0)
+        self.assertEqual(stats.max_code_length, 1)
+        self.assertEqual(stats.distinct_symbols, 2)
+        # 8 code bits, packed 7 to a byte
+        self.assertEqual(stats.expected_size, 2)
+        self.assertEqual(stats.actual_size, 2)
+        self.assertEqual(stats.sampling_cost_ratio, 1.0)
+
+    def test_code_lengths(self):
+        es = self.encode("aaaabbc")
+        lengths = es._huffman_tree.code_lengths()
+        self.assertEqual(lengths[ord("a")], 1)
+        self.assertEqual(lengths[ord("b")], 2)
+        self.assertEqual(es.stats.max_code_length, 2)
+        # a prefix code can't beat the entropy
+        self.assertGreaterEqual(es.stats.avg_code_length, es.stats.sample_entropy)
+
+    def test_sampling_cost(self):
+        # the sample sees "c" as rare, then it fills the second half
+        es = self.encode("aaaaaabc" + "cccccccc", 0.5)
+        stats = es.stats
+        self.assertAlmostEqual(stats.avg_code_length, 1.25)
+        self.assertAlmostEqual(stats.full_avg_code_length, 1.625)
+        self.assertAlmostEqual(stats.sampling_cost_ratio, 1.3)
+        self.assertEqual(stats.uncoded_symbols, 0)
+        self.assertEqual(stats.expected_size, 4)
+        self.assertEqual(stats.actual_size, 4)
+
+        es.decode(es._huffman_tree.mapping)
+        self.assertEqual(es.raw_stream, bytearray(b"aaaaaabccccccccc"))
+
+    def test_sample_misses_symbols(self):
+        # the sample is "aaaabbbb", so "z" has no code
+        es = EncodeStream()
+        es.raw_stream = bytearray(b"aaaabbbbzz")
+        with self.assertRaises(ValueError):
+            es.encode(0.8)
+
+        # the stats are still there to say why
+        stats = es.stats
+        self.assertEqual(stats.uncoded_symbols, 2)
+        self.assertAlmostEqual(stats.avg_code_length, 1.0)
+        self.assertAlmostEqual(stats.full_avg_code_length, 1.0)
+        self.assertEqual(stats.expected_size, 2)
+        self.assertEqual(stats.actual_size, 0)
+
+    def test_zero_byte(self):
+        # the tree never gives 0 a code
+        es = EncodeStream()
+        es.raw_stream = bytearray(b"a\x00b\x00ab")
+        with self.assertRaises(ValueError):
+            es.encode()
+        self.assertEqual(es.stats.uncoded_symbols, 2)
+
+    def test_timings(self):
+        stats = self.encode("adkjJHJLKdfgmcxmncmxm2398u2JHHFS").stats
+        self.assertEqual(set(stats.timings), set(EncodeStats.PHASES))
+        self.assertTrue(all(t >= 0 for t in stats.timings.values()))
+
+    def test_export(self):
+        stats = self.encode("aaaabbc").stats
+        d = json.loads(stats.to_json())
+        self.assertEqual(d, stats.to_dict())
+        self.assertEqual(d["actual_size"], stats.actual_size)
+        self.assertIn("pack", d["timings"])
+
+
+if __name__ == '__main__':
+    unittest.main()
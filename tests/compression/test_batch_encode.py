@@ -0,0 +1,131 @@
+import heapq
+import unittest
+
+import numpy as np
+
+from compression.huffman import (
+    HuffByte, huffBytes_to_Nodes, build_huffman_tree
+)
+from compression.batch_encode import (
+    build_tree, code_tables, tree_code_tables, encode_symbols, encode_with_tree
+)
+
+
+def reference_bits(symbols, codes, lengths):
+    """ the expected bit string, one symbol at a time """
+    return "".join(format(int(codes[s]), "0{}b".format(lengths[s])) for s in symbols)
+
+def skewed_tree(n):
+    """ symbol k has frequency 2**-k, so the longest code is n - 1 bits """
+    huffbytes = [HuffByte(value=k, frequency=2.0 ** -k) for k in range(1, n + 1)]
+    nodes = sorted(huffBytes_to_Nodes(huffbytes), key=lambda n : n.value.frequency, reverse=True)
+    return build_huffman_tree(nodes)
+
+def optimal_bits(counts):
+    """ the size of an optimal prefix code for `counts`, in bits """
+    heap = [int(n) for n in counts if n]
+    heapq.heapify(heap)
+    total = 0
+    while (len(heap) > 1):
+        merged = heapq.heappop(heap) + heapq.heappop(heap)
+        total += merged
+        heapq.heappush(heap, merged)
+    return total
+
+def to_bits(data, nbits):
+    return "".join(format(b, "08b") for b in data)[:nbits]
+
+
+class TestBatchEncode(unittest.TestCase):
+
+    def test_code_tables(self):
+        mapping = {
+            97 : HuffByte(value=97, encoded_value=0b11),
+            98 : HuffByte(value=98, encoded_value=0b101),
+        }
+        codes, lengths = code_tables(mapping)
+        self.assertEqual((codes[97], lengths[97]), (1, 1))
+        self.assertEqual((codes[98], lengths[98]), (1, 2))
+        self.assertEqual(lengths[99], 0)
+
+    def test_encode_symbols(self):
+        codes = np.zeros(256, dtype=np.uint32)
+        lengths = np.zeros(256, dtype=np.uint8)
+        codes[[1, 2, 3]] = [0b0, 0b10, 0b11]
+        lengths[[1, 2, 3]] = [1, 2, 2]
+        symbols = np.array([1, 2, 3, 1, 1, 3], dtype=np.uint8)
+
+        data, nbits = encode_symbols(symbols, codes, lengths)
+        self.assertEqual(nbits, 9)
+        self.assertEqual(to_bits(data, nbits), "010110011")
+        self.assertEqual(len(data), 2)
+
+    def test_encode_with_tree__bytes(self):
+        stream = bytearray("adkjJHJLKdfgmcxmncmxm2398u2JHHFSdfadaps34ooiqwqek\x00\x00", "ascii")
+        symbols = np.frombuffer(bytes(stream), dtype=np.uint8)
+        tree = build_tree(symbols)
+        codes, lengths = tree_code_tables(tree)
+
+        data, nbits = encode_with_tree(symbols, tree)
+        self.assertEqual(to_bits(data, nbits), reference_bits(symbols, codes, lengths))
+        self.assertGreater(lengths[0], 0)
+
+    def test_encode_with_tree__uint16(self):
+        rng = np.random.RandomState(0)
+        symbols = rng.choice([0, 7, 285, 1000, 40000], size=500,
+                             p=[.5, .2, .15, .1, .05]).astype(np.uint16)
+        tree = build_tree(symbols)
+        codes, lengths = tree_code_tables(tree, 65536)
+
+        data, nbits = encode_with_tree(symbols, tree)
+        self.assertEqual(to_bits(data, nbits), reference_bits(symbols, codes, lengths))
+        self.assertLess(nbits, 500 * 3)
+
+    def test_single_symbol(self):
+        symbols = np.full(9, 5, dtype=np.uint8)
+        data, nbits = encode_with_tree(symbols, build_tree(symbols))
+        self.assertEqual(nbits, 9)
+
+    def test_repeated_builds(self):
+        # every build sorts, however many came before it, so every tree
+        # is optimal
+        rng = np.random.RandomState(0)
+        symbols = rng.randint(0, 256, size=4000).astype(np.uint8)
+        counts = np.bincount(symbols, minlength=256)
+        first = tree_code_tables(build_tree(symbols))[1]
+        self.assertEqual(int((first.astype(np.int64) * counts).sum()), optimal_bits(counts))
+        for _ in range(50):
+            lengths = tree_code_tables(build_tree(symbols))[1]
+            np.testing.assert_array_equal(lengths, first)
+
+    def test_long_codes(self):
+        tree = skewed_tree(40)
+        codes, lengths = tree_code_tables(tree)
+        self.assertEqual(lengths.max(), 39)
+        symbols = np.array([1, 40, 39, 2, 40], dtype=np.uint8)
+        data, nbits = encode_with_tree(symbols, tree)
+        self.assertEqual(to_bits(data, nbits), reference_bits(symbols, codes, lengths))
+
+    def test_too_long_codes(self):
+        with self.assertRaises(ValueError):
+            tree_code_tables(skewed_tree(70))
+        with self.assertRaises(ValueError):
+            code_tables({1 : HuffByte(value=1, encoded_value=1 << 65)})
+
+    def test_missing_code(self):
+        codes, lengths = code_tables({})
+        with self.assertRaises(ValueError):
+            encode_symbols(np.array([4], dtype=np.uint8), codes, lengths)
+
+    def test_bad_dtype(self):
+        codes, lengths = code_tables({})
+        with self.assertRaises(TypeError):
+            encode_symbols(np.array([4], dtype=np.int32), codes, lengths)
+
+    def test_empty(self):
+        codes, lengths = code_tables({})
+        self.assertEqual(encode_symbols(np.array([], dtype=np.uint8), codes, lengths), (b"", 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,21 @@
+import numpy as np
+from filters import benchmark_strategies
+
+# a noisy gradient roughly the size of a photo thumbnail, truecolor
+height, width, bpp = 256, 256, 3
+rng = np.random.RandomState(0)
+gradient = np.add.outer(np.arange(height), np.arange(width * bpp)) // 3
+rows = (gradient + rng.randint(0, 6, size=gradient.shape)).astype(np.uint8)
+
+results = benchmark_strategies(rows, bpp)
+raw_length = rows.size + height
+
+print("        The raw filtered stream is {} bytes long".format(raw_length))
+for name in sorted(results, key=lambda k : results[k]["size"]):
+    r = results[name]
+    print("""
+        {} :
+            - compressed to {} bytes ({}% of raw)
+            - took {} seconds
+        """.format(name, r["size"], round(r["size"]/raw_length * 100, 1),
+                   round(r["seconds"], 4)))
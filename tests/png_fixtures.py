@@ -0,0 +1,43 @@
+""" helpers for building small PNGs in memory for tests """
+
+import struct
+import zlib
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def make_chunk(chunk_type, data=b""):
+    """ length, type, data, CRC """
+    body = chunk_type + data
+    return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+def make_ihdr(width, height, bit_depth=8, color_type=2, interlace=0):
+    return struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, interlace)
+
+def make_png(width, height, rows=None, bit_depth=8, color_type=2,
+             before_idat=(), after_idat=(), idat_parts=1, filtered=None):
+    """ Returns a complete PNG file as bytes
+
+        rows - raw (unfiltered) scanlines as bytes. Filter type 0 is used.
+               Defaults to zero bytes
+        before_idat, after_idat - (type, data) pairs of extra chunks
+        idat_parts - number of IDAT chunks to split the image data across
+        filtered - already filtered scanlines (filter bytes included) to use
+                   in place of rows
+    """
+    channels = {0 : 1, 2 : 3, 3 : 1, 4 : 2, 6 : 4}[color_type]
+    stride = (width * bit_depth * channels + 7) // 8
+    if (rows is None):
+        rows = [bytes(stride)] * height
+
+    if (filtered is None):
+        filtered = b"".join(b"\x00" + bytes(r) for r in rows)
+    idat = zlib.compress(filtered)
+    step = -(-len(idat) // idat_parts)
+
+    out = PNG_SIGNATURE + make_chunk(b"IHDR", make_ihdr(width, height, bit_depth, color_type))
+    out += b"".join(make_chunk(t, d) for t, d in before_idat)
+    out += b"".join(make_chunk(b"IDAT", idat[i:i + step]) for i in range(0, len(idat), step))
+    out += b"".join(make_chunk(t, d) for t, d in after_idat)
+    out += make_chunk(b"IEND")
+    return out
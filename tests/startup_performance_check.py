@@ -0,0 +1,64 @@
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from png_fixtures import make_png
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+MODULES = ("parse_png", "push_parser", "chunk_index", "batch", "cache", "decode", "optimize")
+RUNS = 15
+
+FIRST_IHDR = """
+import sys, parse_png
+with open(sys.argv[1], "rb") as f:
+    parse_png.parse_header(f.read(parse_png.HEADER_LENGTH))
+"""
+
+
+def python(*args):
+    return subprocess.run([sys.executable] + list(args), cwd=SRC,
+                          capture_output=True, text=True, check=True)
+
+def import_time(module):
+    """ cumulative microseconds for `import module`, as -X importtime reports it """
+    out = python("-X", "importtime", "-c", "import " + module).stderr
+    last = out.strip().splitlines()[-1]
+    return int(last.split("|")[1])
+
+def wall_time(*args):
+    """ median seconds to start python, run `args` and exit """
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        python(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+# warm the bytecode cache, so compiling isn't counted
+python("-c", "import " + ", ".join(MODULES))
+
+print("        import times (-X importtime, best of {})".format(RUNS))
+for module in MODULES:
+    us = min(import_time(module) for _ in range(RUNS))
+    print("            {:<12} {:>8.1f} ms".format(module, us / 1000))
+
+fd, fp = tempfile.mkstemp(suffix=".png")
+with os.fdopen(fd, "wb") as f:
+    f.write(make_png(640, 480))
+
+try:
+    bare = wall_time("-c", "pass")
+    first_ihdr = wall_time("-c", FIRST_IHDR, fp)
+finally:
+    os.remove(fp)
+
+print("""
+        cold start, median of {} runs :
+            - bare interpreter : {} ms
+            - time to first IHDR : {} ms ({} ms over bare)
+        """.format(RUNS, round(bare * 1000, 1), round(first_ihdr * 1000, 1),
+                   round((first_ihdr - bare) * 1000, 1)))
@@ -0,0 +1,92 @@
+import asyncio
+import struct
+import unittest
+
+import async_png
+import parse_png
+from .png_fixtures import make_png
+
+
+def reader_for(*parts, eof=True):
+    reader = asyncio.StreamReader()
+    for part in parts:
+        reader.feed_data(part)
+    if (eof):
+        reader.feed_eof()
+    return reader
+
+
+class TestAsyncPNG(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.data = make_png(7, 5, before_idat=[(b"tEXt", b"k\x00v")], idat_parts=2)
+
+    async def test_read_header(self):
+        reader = reader_for(self.data)
+        calc = await async_png.read_header(reader)
+        self.assertEqual(calc["width"], 7)
+        self.assertEqual(calc["height"], 5)
+        self.assertEqual(calc["color_type"], 2)
+
+    async def test_read_header__before_body_arrives(self):
+        # only the header has been sent and the stream is still open
+        reader = reader_for(self.data[:parse_png.HEADER_LENGTH], eof=False)
+        calc = await asyncio.wait_for(async_png.read_header(reader), 1)
+        self.assertEqual(calc["width"], 7)
+
+    async def test_read_header__split_feeds(self):
+        reader = asyncio.StreamReader()
+
+        async def trickle():
+            for i in range(0, len(self.data), 3):
+                reader.feed_data(self.data[i:i + 3])
+                await asyncio.sleep(0)
+            reader.feed_eof()
+
+        task = asyncio.ensure_future(trickle())
+        calc = await async_png.read_header(reader)
+        await task
+        self.assertEqual(calc["height"], 5)
+
+    async def test_read_header__bad_signature(self):
+        # rejected from the first few bytes, without waiting for the rest
+        reader = reader_for(b"GIF8", eof=False)
+        with self.assertRaises(ValueError):
+            await asyncio.wait_for(async_png.read_header(reader), 1)
+
+    async def test_read_header__bad_crc(self):
+        data = bytearray(self.data)
+        data[20] ^= 0xFF
+        with self.assertRaises(ValueError):
+            await async_png.read_header(reader_for(bytes(data)))
+
+    async def test_read_header__truncated(self):
+        with self.assertRaises(ValueError):
+            await async_png.read_header(reader_for(self.data[:20]))
+
+    async def test_read_png(self):
+        header, chunks = await async_png.read_png(reader_for(self.data))
+        self.assertEqual(header["width"], 7)
+        self.assertEqual([c["type"] for c in chunks], ["tEXt", "IDAT", "IDAT", "IEND"])
+        self.assertEqual(chunks[0]["raw_data"], b"k\x00v")
+
+    async def test_iter_chunks__truncated(self):
+        with self.assertRaises(ValueError):
+            await async_png.read_png(reader_for(self.data[:-6]))
+
+    async def test_iter_chunks__oversized(self):
+        # the stream stays open: a declared length must be refused up front
+        huge = struct.pack(">I", 0xFFFFFFF0) + b"IDAT" + b"\x00" * 100
+        reader = reader_for(self.data[:parse_png.HEADER_LENGTH], huge, eof=False)
+        with self.assertRaises(ValueError):
+            await asyncio.wait_for(async_png.read_png(reader), 1)
+
+    async def test_iter_chunks__max_chunk(self):
+        with self.assertRaises(ValueError):
+            await async_png.read_png(reader_for(self.data), max_chunk=2)
+        header, chunks = await async_png.read_png(reader_for(self.data), max_chunk=2**16)
+        self.assertEqual(len(chunks), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import batch
+from .png_fixtures import make_png
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.dir, "sub"))
+        self.pngs = [
+            os.path.join(self.dir, "a.png"),
+            os.path.join(self.dir, "sub", "b.PNG"),
+        ]
+        for i, fp in enumerate(self.pngs):
+            with open(fp, "wb") as f:
+                f.write(make_png(4 + i, 3, idat_parts=2))
+
+        self.bad = os.path.join(self.dir, "sub", "c.png")
+        with open(self.bad, "wb") as f:
+            f.write(b"GIF89a not really")
+
+        with open(os.path.join(self.dir, "notes.txt"), "w") as f:
+            f.write("ignored")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_iter_paths__directory(self):
+        calc = list(batch.iter_paths(self.dir))
+        norm = [self.pngs[0], self.pngs[1], self.bad]
+        self.assertEqual(norm, calc)
+
+    def test_iter_paths__manifest(self):
+        manifest = os.path.join(self.dir, "manifest.txt")
+        with open(manifest, "w") as f:
+            f.write("# header\n{}\n\n{}\n".format(self.pngs[1], self.bad))
+
+        calc = list(batch.iter_paths(manifest))
+        self.assertEqual([self.pngs[1], self.bad], calc)
+
+    def test_inspect_file(self):
+        calc = batch.inspect_file(self.pngs[0])
+        self.assertTrue(calc["is_png"])
+        self.assertEqual(calc["IHDR"]["width"], 4)
+        self.assertEqual(calc["chunks"], ["IHDR", "IDAT", "IDAT", "IEND"])
+        self.assertNotIn("decoded_bytes", calc)
+        self.assertIn("total", calc["timings"])
+
+    def test_inspect_file__decode(self):
+        calc = batch.inspect_file(self.pngs[1], decode=True)
+        # 3 rows of 1 filter byte + 5 px * 3 bytes
+        self.assertEqual(calc["decoded_bytes"], 3 * (1 + 15))
+
+    def test_inspect_file__not_png(self):
+        calc = batch.inspect_file(self.bad)
+        self.assertFalse(calc["is_png"])
+        self.assertNotIn("chunks", calc)
+
+    def test_inspect_file__missing(self):
+        calc = batch.inspect_file(os.path.join(self.dir, "gone.png"))
+        self.assertIn("error", calc)
+
+    def test_inspect_many(self):
+        paths = (p for p in self.pngs + [self.bad])
+        calc = sorted(r["path"] for r in batch.inspect_many(paths, workers=2))
+        self.assertEqual(sorted(self.pngs + [self.bad]), calc)
+
+    def test_write_jsonl(self):
+        out = io.StringIO()
+        results = batch.inspect_many(batch.iter_paths(self.dir), workers=2)
+        n = batch.write_jsonl(results, out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(n, 3)
+        self.assertEqual(len(lines), 3)
+        self.assertEqual({json.loads(l)["path"] for l in lines},
+                         set(self.pngs + [self.bad]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from cache import PNGCache
+from .png_fixtures import make_png
+
+
+class TestPNGCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(3):
+            fp = os.path.join(self.dir, "{}.png".format(i))
+            with open(fp, "wb") as f:
+                f.write(make_png(10 + i, 10))
+            self.paths.append(fp)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_header_hit_miss(self):
+        cache = PNGCache()
+        first = cache.header(self.paths[0])
+        second = cache.header(self.paths[0])
+        self.assertEqual(first, second)
+        self.assertEqual(first["width"], 10)
+        self.assertEqual(cache.stats["hits"], 1)
+        self.assertEqual(cache.stats["misses"], 1)
+
+    def test_header_copied(self):
+        # a caller's changes don't reach the cached entry
+        cache = PNGCache()
+        cache.header(self.paths[0])["width"] = 0
+        self.assertEqual(cache.header(self.paths[0])["width"], 10)
+        cache.pixels(self.paths[0])[0]["width"] = 0
+        self.assertEqual(cache.pixels(self.paths[0])[0]["width"], 10)
+
+    def test_pixels(self):
+        cache = PNGCache()
+        header, rows = cache.pixels(self.paths[1])
+        self.assertEqual(rows.shape, (10, 33))
+        self.assertFalse(rows.flags.writeable)
+        self.assertIs(cache.pixels(self.paths[1])[1], rows)
+
+    def test_invalidated_by_change(self):
+        cache = PNGCache()
+        cache.header(self.paths[0])
+        with open(self.paths[0], "wb") as f:
+            f.write(make_png(99, 10, after_idat=[(b"tEXt", b"a\x00b")]))
+
+        self.assertEqual(cache.header(self.paths[0])["width"], 99)
+        self.assertEqual(cache.stats["misses"], 2)
+
+    def test_lru_eviction(self):
+        # room for two decoded images (10 rows of ~33 bytes + overhead each)
+        cache = PNGCache(max_bytes=2 * 1000)
+        cache.pixels(self.paths[0])
+        cache.pixels(self.paths[1])
+        cache.pixels(self.paths[0]) # 0 is now most recent
+        cache.pixels(self.paths[2]) # evicts 1
+
+        stats = cache.stats
+        self.assertEqual(stats["evictions"], 1)
+        self.assertLessEqual(stats["bytes"], cache.max_bytes)
+        cache.pixels(self.paths[0])
+        self.assertEqual(cache.stats["hits"], 2)
+        cache.pixels(self.paths[1])
+        self.assertEqual(cache.stats["misses"], 4)
+
+    def test_too_big_not_cached(self):
+        cache = PNGCache(max_bytes=100)
+        cache.pixels(self.paths[0])
+        self.assertEqual(cache.stats["entries"], 0)
+
+    def test_hash_key_shares_identical_files(self):
+        copy = os.path.join(self.dir, "copy.png")
+        shutil.copy(self.paths[0], copy)
+        cache = PNGCache(key="hash")
+        cache.header(self.paths[0])
+        cache.header(copy)
+        self.assertEqual(cache.stats["hits"], 1)
+
+    def test_bad_key(self):
+        with self.assertRaises(ValueError):
+            PNGCache(key="path")
+
+    def test_threads(self):
+        cache = PNGCache()
+        errors = []
+
+        def work():
+            try:
+                for _ in range(50):
+                    for fp in self.paths:
+                        cache.header(fp)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats = cache.stats
+        self.assertEqual(errors, [])
+        self.assertEqual(stats["hits"] + stats["misses"], 4 * 50 * 3)
+        self.assertEqual(stats["entries"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
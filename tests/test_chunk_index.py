@@ -0,0 +1,103 @@
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from unittest import mock
+import zlib
+
+import chunk_index
+from .png_fixtures import make_png
+
+
+class TestChunkIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.fp = os.path.join(self.dir, "tile.png")
+        rows = [bytes(range(i, i + 24)) for i in range(8)]
+        self.data = make_png(8, 8, rows, before_idat=[(b"tEXt", b"zoom\x0012")], idat_parts=4)
+        with open(self.fp, "wb") as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_build_index(self):
+        index = chunk_index.build_index(self.fp)
+        calc = [e.type_code for e in index.entries]
+        self.assertEqual(calc, [b"IHDR", b"tEXt"] + [b"IDAT"] * 4 + [b"IEND"])
+        self.assertEqual(index.size, len(self.data))
+
+    def test_roundtrip_bytes(self):
+        index = chunk_index.build_index(self.fp)
+        calc = chunk_index.ChunkIndex.from_bytes(index.to_bytes())
+        self.assertEqual(index.entries, calc.entries)
+        self.assertEqual(index.mtime_ns, calc.mtime_ns)
+
+    def test_from_bytes__garbage(self):
+        with self.assertRaises(ValueError):
+            chunk_index.ChunkIndex.from_bytes(b"PNGIDX\x01")
+
+    def test_open_index__saves_and_loads(self):
+        index = chunk_index.open_index(self.fp)
+        self.assertTrue(os.path.isfile(chunk_index.index_path(self.fp)))
+        calc = chunk_index.load_index(self.fp)
+        self.assertEqual(index.entries, calc.entries)
+
+    def test_save_index__private_tmp(self):
+        # a leftover ".tmp" from another writer is neither used nor removed
+        path = chunk_index.index_path(self.fp)
+        with open(path + ".tmp", "wb") as f:
+            f.write(b"someone else's")
+        chunk_index.save_index(chunk_index.build_index(self.fp), path)
+        self.assertIsNotNone(chunk_index.load_index(self.fp))
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                         ["tile.png", "tile.png.chunkidx", "tile.png.chunkidx.tmp"])
+
+    def test_save_index__mode(self):
+        # as open() would make it, not mkstemp's 0600
+        path = chunk_index.index_path(self.fp)
+        old = os.umask(0o022)
+        try:
+            chunk_index.save_index(chunk_index.build_index(self.fp), path)
+        finally:
+            os.umask(old)
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+
+    def test_open_index__unwritable(self):
+        with mock.patch("os.replace", side_effect=PermissionError):
+            index = chunk_index.open_index(self.fp)
+        self.assertEqual(len(index.entries), 7)
+        self.assertEqual(os.listdir(self.dir), ["tile.png"])
+
+    def test_load_index__stale(self):
+        chunk_index.open_index(self.fp)
+        with open(self.fp, "ab") as f:
+            f.write(b"\x00")
+
+        self.assertIsNone(chunk_index.load_index(self.fp))
+        calc = chunk_index.open_index(self.fp)
+        self.assertEqual(calc.size, len(self.data) + 1)
+
+    def test_read_chunk(self):
+        index = chunk_index.open_index(self.fp)
+        calc = chunk_index.read_chunk(self.fp, index.find(b"tEXt")[0])
+        self.assertEqual(calc, b"zoom\x0012")
+
+    def test_read_chunk__bad_crc(self):
+        index = chunk_index.open_index(self.fp)
+        entry = index.find(b"tEXt")[0]._replace(crc=0)
+        with self.assertRaises(ValueError):
+            chunk_index.read_chunk(self.fp, entry)
+
+    def test_read_idat(self):
+        index = chunk_index.open_index(self.fp)
+        idat = chunk_index.read_idat(self.fp, index)
+        norm = b"".join(b"\x00" + bytes(range(i, i + 24)) for i in range(8))
+        self.assertEqual(zlib.decompress(idat), norm)
+        self.assertEqual(chunk_index.read_idat(self.fp, index, 5, 17), idat[5:17])
+
+
+if __name__ == '__main__':
+    unittest.main()
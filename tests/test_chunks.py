@@ -0,0 +1,121 @@
+import struct
+import unittest
+import zlib
+
+import chunks
+from .png_fixtures import make_png
+
+
+class TestChunks(unittest.TestCase):
+
+    def setUp(self):
+        itxt = b"Title\x00\x00\x00de\x00Titel\x00Caf\xc3\xa9"
+        self.data = make_png(
+            9, 4, bit_depth=8, color_type=3,
+            before_idat=[
+                (b"PLTE", bytes([255, 0, 0, 0, 255, 0, 0, 0, 255])),
+                (b"tRNS", bytes([0, 128, 255])),
+                (b"tEXt", b"Author\x00luke"),
+                (b"zTXt", b"Comment\x00\x00" + zlib.compress(b"squeezed")),
+                (b"iTXt", itxt),
+                (b"pHYs", struct.pack(">IIB", 3780, 3780, 1)),
+                (b"gAMA", struct.pack(">I", 45455)),
+                (b"tIME", struct.pack(">HBBBBB", 2016, 1, 2, 3, 4, 5)),
+                (b"prVt", b"custom"),
+            ],
+        )
+        self.chunks = chunks.read_chunks(self.data)
+        self.by_type = {c.type : c for c in self.chunks}
+
+    def test_types(self):
+        calc = [c.type for c in self.chunks]
+        norm = ["IHDR", "PLTE", "tRNS", "tEXt", "zTXt", "iTXt", "pHYs",
+                "gAMA", "tIME", "prVt", "IDAT", "IEND"]
+        self.assertEqual(norm, calc)
+        self.assertIsInstance(self.by_type["IHDR"], chunks.IHDRChunk)
+        self.assertIs(type(self.by_type["prVt"]), chunks.Chunk)
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            self.by_type["tEXt"].__dict__
+
+    def test_data_is_a_view(self):
+        calc = self.by_type["prVt"].data
+        self.assertIsInstance(calc, memoryview)
+        self.assertEqual(bytes(calc), b"custom")
+
+    def test_crc(self):
+        self.assertTrue(all(c.check_crc() for c in self.chunks))
+
+    def test_IHDR(self):
+        ihdr = self.by_type["IHDR"]
+        self.assertEqual(ihdr.width, 9)
+        self.assertEqual(ihdr.height, 4)
+        self.assertEqual(ihdr.color_type, 3)
+        self.assertEqual(ihdr.fields()["bit_depth"], 8)
+
+    def test_PLTE(self):
+        plte = self.by_type["PLTE"]
+        self.assertEqual(len(plte), 3)
+        self.assertEqual(plte[1], (0, 255, 0))
+        with self.assertRaises(IndexError):
+            plte[3]
+
+    def test_tRNS(self):
+        self.assertEqual(self.by_type["tRNS"].alpha, bytes([0, 128, 255]))
+
+    def test_text(self):
+        self.assertEqual(self.by_type["tEXt"].keyword, "Author")
+        self.assertEqual(self.by_type["tEXt"].text, "luke")
+        self.assertEqual(self.by_type["zTXt"].keyword, "Comment")
+        self.assertEqual(self.by_type["zTXt"].text, "squeezed")
+        self.assertEqual(self.by_type["iTXt"].text, "Café")
+        self.assertEqual(self.by_type["iTXt"].fields()["language"], "de")
+
+    def test_pHYs_gAMA_tIME(self):
+        self.assertEqual(self.by_type["pHYs"].ppu_y, 3780)
+        self.assertEqual(self.by_type["pHYs"].unit, 1)
+        self.assertAlmostEqual(self.by_type["gAMA"].gamma, 0.45455)
+        self.assertEqual(self.by_type["tIME"].fields()["second"], 5)
+
+    def test_property_bits(self):
+        self.assertTrue(chunks.is_critical(b"IDAT"))
+        self.assertFalse(chunks.is_critical(b"tEXt"))
+        self.assertTrue(chunks.is_public(b"tEXt"))
+        self.assertFalse(chunks.is_public(b"prVt"))
+        self.assertTrue(chunks.is_safe_to_copy(b"tEXt"))
+        self.assertFalse(chunks.is_safe_to_copy(b"gAMA"))
+        self.assertTrue(self.by_type["PLTE"].critical)
+        self.assertTrue(self.by_type["prVt"].safe_to_copy)
+
+    def test_register_chunk_type(self):
+        class prVtChunk(chunks.Chunk):
+            __slots__ = ()
+
+            @property
+            def word(self):
+                return bytes(self.data).decode("ascii")
+
+        chunks.register_chunk_type(b"prVt", prVtChunk)
+        try:
+            calc = [c for c in chunks.read_chunks(self.data) if c.type == "prVt"][0]
+            self.assertEqual(calc.word, "custom")
+            self.assertEqual(chunks.chunk_name(b"prVt"), "prVt")
+        finally:
+            del chunks.CHUNK_TYPES[b"prVt"]
+
+    def test_register_chunk_type__invalid(self):
+        with self.assertRaises(ValueError):
+            chunks.register_chunk_type(b"pr1t")
+
+    def test_chunk_name(self):
+        self.assertEqual(chunks.chunk_name(b"cHRM"), "cHRM")
+        self.assertIsNone(chunks.chunk_name(b"prVt"))
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            chunks.read_chunks(self.data[:-20])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+
+import numpy as np
+
+import decode
+import filters
+from .png_fixtures import make_png
+
+
+class TestDecode(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        self.rows = rng.randint(0, 256, size=(10, 5 * 4)).astype(np.uint8)
+        filtered = filters.filter_image(self.rows, 4, "min_sum")
+        self.data = make_png(5, 10, color_type=6, filtered=filtered, idat_parts=3)
+
+    def test_decode_rows(self):
+        header, rows = decode.decode_rows(self.data)
+        self.assertEqual(header["width"], 5)
+        np.testing.assert_array_equal(rows, self.rows)
+
+    def test_decode_rows__band(self):
+        header, rows = decode.decode_rows(self.data, 3, 7)
+        np.testing.assert_array_equal(rows, self.rows[3:7])
+        header, rows = decode.decode_rows(self.data, 8, 50)
+        np.testing.assert_array_equal(rows, self.rows[8:])
+        header, rows = decode.decode_rows(self.data, 5, 5)
+        self.assertEqual(rows.shape, (0, 20))
+
+    def test_decode_rows__stops_early(self):
+        # incompressible rows spread over many IDATs, the last one corrupt:
+        # a top band decodes, the whole image can't
+        rng = np.random.RandomState(2)
+        rows = rng.randint(0, 256, size=(64, 300)).astype(np.uint8)
+        filtered = filters.filter_image(rows, 3, "none")
+        data = bytearray(make_png(100, 64, filtered=filtered, idat_parts=16))
+        data[-40:-20] = bytes(20)
+
+        header, calc = decode.decode_rows(bytes(data), 0, 4)
+        np.testing.assert_array_equal(calc, rows[:4])
+        with self.assertRaises(ValueError):
+            decode.decode_rows(bytes(data))
+
+    def test_decode_scaled(self):
+        header, calc = decode.decode_scaled(self.data, 2)
+        self.assertEqual(calc.shape, (5, 3, 4))
+
+        pixels = self.rows.reshape(10, 5, 4).astype(np.uint32)
+        norm = pixels[2:4, 2:4].sum(axis=(0, 1)) // 4
+        np.testing.assert_array_equal(calc[1, 1], norm)
+        # right edge block is 2 rows x 1 column
+        norm = pixels[0:2, 4].sum(axis=0) // 2
+        np.testing.assert_array_equal(calc[0, 2], norm)
+
+    def test_decode_scaled__band(self):
+        header, calc = decode.decode_scaled(self.data, 4, 0, 4)
+        self.assertEqual(calc.shape, (1, 2, 4))
+        pixels = self.rows.reshape(10, 5, 4).astype(np.uint32)
+        np.testing.assert_array_equal(calc[0, 0], pixels[0:4, 0:4].sum(axis=(0, 1)) // 16)
+
+    def test_decode_scaled__16bit(self):
+        samples = (np.arange(4 * 6).reshape(4, 6) * 1000).astype(">u2")
+        data = make_png(6, 4, [r.tobytes() for r in samples], bit_depth=16, color_type=0)
+        header, calc = decode.decode_scaled(data, 2)
+        self.assertEqual(calc.dtype, np.uint16)
+        self.assertEqual(calc[0, 0, 0], (0 + 1000 + 6000 + 7000) // 4)
+
+    def test_decode_scaled__palette(self):
+        rows = [bytes([0, 1, 2, 0]), bytes([2, 2, 2, 2])]
+        data = make_png(4, 2, rows, color_type=3)
+        header, calc = decode.decode_scaled(data, 2)
+        np.testing.assert_array_equal(calc[:, :, 0], [[0, 2]])
+
+    def test_decode_scaled__palette_4bit(self):
+        # 5 indices a row, the last byte half padding
+        rows = [bytes([0x12, 0x34, 0x50]), bytes([0x67, 0x89, 0xa0])]
+        data = make_png(5, 2, rows, bit_depth=4, color_type=3)
+        header, calc = decode.decode_scaled(data, 2)
+        self.assertEqual(calc.dtype, np.uint8)
+        np.testing.assert_array_equal(calc[:, :, 0], [[1, 3, 5]])
+
+    def test_decode_scaled__1bit(self):
+        rows = [bytes([0b11110000]), bytes([0b11001100])]
+        data = make_png(8, 2, rows, bit_depth=1, color_type=0)
+        header, calc = decode.decode_scaled(data, 2)
+        # means of 2x2 blocks of 0s and 1s, rounded down
+        np.testing.assert_array_equal(calc[:, :, 0], [[1, 0, 0, 0]])
+
+    def test_decode_scaled__bad_scale(self):
+        with self.assertRaises(ValueError):
+            decode.decode_scaled(self.data, 3)
+
+    def test_decode_rows__interlaced(self):
+        data = bytearray(self.data)
+        data[28] = 1 # interlace method
+        with self.assertRaises(ValueError):
+            decode.decode_rows(bytes(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
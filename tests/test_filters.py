@@ -0,0 +1,104 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import filters
+
+
+class TestFilters(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        gradient = np.add.outer(np.arange(12), np.arange(30)).astype(np.uint8)
+        noise = rng.randint(0, 8, size=gradient.shape).astype(np.uint8)
+        self.rows = gradient * 4 + noise
+        self.bpp = 3
+
+    def test_bytes_per_pixel(self):
+        self.assertEqual(filters.bytes_per_pixel(8, 6), 4)
+        self.assertEqual(filters.bytes_per_pixel(16, 2), 6)
+        self.assertEqual(filters.bytes_per_pixel(1, 0), 1)
+
+    def test_row_stride(self):
+        self.assertEqual(filters.row_stride(10, 1, 0), 2)
+        self.assertEqual(filters.row_stride(10, 8, 2), 30)
+
+    def test_candidates_roundtrip(self):
+        cands = filters.filter_candidates(self.rows, self.bpp)
+        for f in filters.FILTER_TYPES:
+            prev = np.zeros(self.rows.shape[1], dtype=np.uint8)
+            for y in range(self.rows.shape[0]):
+                row = filters.unfilter_row(f, cands[f, y], prev, self.bpp)
+                np.testing.assert_array_equal(row, self.rows[y])
+                prev = row
+
+    def test_unfilter_rows_matches_unfilter_row(self):
+        rng = np.random.RandomState(1)
+        mixed = filters.FILTER_TYPES
+        cheap = (filters.NONE, filters.SUB, filters.UP)
+        paeth = (filters.PAETH,)
+        # enough Average / Paeth rows for the wavefront, and too few
+        for bpp, choices in ((1, mixed), (3, mixed), (4, paeth), (6, mixed), (3, cheap)):
+            rows = rng.randint(0, 256, size=(20, bpp * 9)).astype(np.uint8)
+            types = rng.choice(choices, size=20)
+            prev = rng.randint(0, 256, size=bpp * 9).astype(np.uint8)
+            calc = filters.unfilter_rows(types, rows, prev, bpp)
+            for y in range(20):
+                prev = filters.unfilter_row(types[y], rows[y], prev, bpp)
+                np.testing.assert_array_equal(calc[y], prev)
+
+    def test_unfilter_rows__bad_type(self):
+        with self.assertRaises(ValueError):
+            filters.unfilter_rows([5], np.zeros((1, 3), dtype=np.uint8),
+                                  np.zeros(3, dtype=np.uint8), 3)
+
+    def test_min_sum_prefers_up_for_repeated_rows(self):
+        rows = np.tile(np.arange(0, 240, 7, dtype=np.uint8), (4, 1))
+        chosen, _ = filters.select_filters(rows, 1, "min_sum")
+        self.assertTrue((chosen[1:] == filters.UP).all())
+
+    def test_fixed_strategy(self):
+        chosen, _ = filters.select_filters(self.rows, self.bpp, "paeth")
+        self.assertTrue((chosen == filters.PAETH).all())
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            filters.filter_image(self.rows, self.bpp, "fastest")
+
+    def test_filter_image_roundtrip(self):
+        height, stride = self.rows.shape
+        for strategy in filters.STRATEGIES:
+            data = filters.filter_image(self.rows, self.bpp, strategy)
+            self.assertEqual(len(data), height * (stride + 1))
+            calc = filters.unfilter_image(data, height, stride, self.bpp)
+            np.testing.assert_array_equal(calc, self.rows)
+
+    def test_brute_force_not_larger_than_fixed(self):
+        sizes = filters.benchmark_strategies(self.rows, self.bpp,
+                                             strategies=["none", "brute_force"])
+        self.assertLessEqual(sizes["brute_force"]["size"], sizes["none"]["size"])
+
+    def test_row_entropy(self):
+        self.assertEqual(filters.row_entropy(bytes(16)), 0.0)
+        self.assertAlmostEqual(filters.row_entropy(bytes(range(4))), 8.0)
+
+    def test_row_entropies(self):
+        # agrees with the Huffman coder's histogram, row by row
+        candidates = filters.filter_candidates(self.rows, self.bpp)
+        costs = filters.row_entropies(candidates)
+        self.assertEqual(costs.shape, candidates.shape[:2])
+        for f in filters.FILTER_TYPES:
+            for y in range(candidates.shape[1]):
+                self.assertAlmostEqual(costs[f, y],
+                                       filters.row_entropy(candidates[f, y].tobytes()))
+
+    def test_row_entropies__blocks(self):
+        candidates = filters.filter_candidates(self.rows, self.bpp)
+        whole = filters.row_entropies(candidates)
+        with mock.patch("filters.ENTROPY_BLOCK", 3):
+            np.testing.assert_allclose(filters.row_entropies(candidates), whole)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+import os
+import shutil
+import stat
+import struct
+import tempfile
+import unittest
+from unittest import mock
+import zlib
+
+import numpy as np
+
+import chunks
+import optimize
+import samples
+from .png_fixtures import make_png
+
+
+def png_from_pixels(pixels, color_type, bit_depth=8, **kwargs):
+    height, width = pixels.shape[:2]
+    dtype = ">u2" if bit_depth == 16 else np.uint8
+    rows = [r.astype(dtype).tobytes() for r in pixels.reshape(height, -1)]
+    return make_png(width, height, rows, bit_depth, color_type, **kwargs)
+
+
+class TestOptimize(unittest.TestCase):
+
+    def assertSamePixels(self, a, b, layout="RGBA8"):
+        np.testing.assert_array_equal(samples.decode_array(a, layout)[1],
+                                      samples.decode_array(b, layout)[1])
+
+    def test_opaque_rgba_to_rgb(self):
+        rng = np.random.RandomState(0)
+        pixels = rng.randint(0, 256, size=(16, 16, 4)).astype(np.uint8)
+        pixels[..., 3] = 255
+        data = png_from_pixels(pixels, 6)
+
+        out, report = optimize.optimize_png(data, workers=0)
+        self.assertEqual(report["color_type"], 2)
+        self.assertLess(len(out), len(data))
+        self.assertSamePixels(data, out)
+
+    def test_few_colors_to_palette(self):
+        colors = np.array([[255, 0, 0, 255], [0, 0, 255, 128], [0, 255, 0, 0]], dtype=np.uint8)
+        idx = np.random.RandomState(2).randint(0, 3, size=(40, 40))
+        data = png_from_pixels(colors[idx], 6)
+
+        out, report = optimize.optimize_png(data, workers=0)
+        self.assertEqual(report["color_type"], 3)
+        self.assertEqual(report["bit_depth"], 2)
+        self.assertSamePixels(data, out)
+        ctypes = [c.type for c in chunks.read_chunks(out)]
+        self.assertEqual(ctypes[:3], ["IHDR", "PLTE", "tRNS"])
+
+    def test_grey_16bit_to_8bit(self):
+        grey = (np.add.outer(np.arange(8), np.arange(8)) * 257).astype(np.uint16)
+        data = png_from_pixels(np.repeat(grey[..., None], 3, axis=-1), 2, 16)
+
+        out, report = optimize.optimize_png(data, filter_strategies=("none",), workers=0)
+        self.assertEqual(report["bit_depth"], 8)
+        self.assertIn(report["color_type"], (0, 3))
+        self.assertSamePixels(data, out, "RGBA16")
+
+    def test_strip_ancillary(self):
+        pixels = np.zeros((4, 4, 3), dtype=np.uint8)
+        data = png_from_pixels(pixels, 2, before_idat=[
+            (b"gAMA", struct.pack(">I", 45455)),
+            (b"tEXt", b"Comment\x00" + b"x" * 200),
+        ])
+
+        out, report = optimize.optimize_png(data, workers=0)
+        self.assertIn("tEXt", report["stripped"])
+        ctypes = [c.type for c in chunks.read_chunks(out)]
+        self.assertIn("gAMA", ctypes)
+        self.assertNotIn("tEXt", ctypes)
+        self.assertEqual(report["saved_bytes"], len(data) - len(out))
+
+    def test_grey_drops_color_profile(self):
+        grey = np.add.outer(np.arange(8), np.arange(8)).astype(np.uint8)
+        iccp = b"RGB profile\x00\x00" + zlib.compress(b"\x00" * 64)
+        data = png_from_pixels(np.repeat(grey[..., None], 3, axis=-1), 2, before_idat=[
+            (b"iCCP", iccp),
+            (b"cHRM", b"\x00" * 32),
+            (b"gAMA", struct.pack(">I", 45455)),
+        ])
+
+        out, report = optimize.optimize_png(data, workers=0)
+        self.assertIn(report["color_type"], (0, 4))
+        ctypes = [c.type for c in chunks.read_chunks(out)]
+        self.assertNotIn("iCCP", ctypes)
+        self.assertNotIn("cHRM", ctypes)
+        self.assertIn("gAMA", ctypes)
+        self.assertEqual(set(report["stripped"]), {"iCCP", "cHRM"})
+
+    def test_never_larger(self):
+        rng = np.random.RandomState(1)
+        pixels = rng.randint(0, 256, size=(8, 8, 3)).astype(np.uint8)
+        data = png_from_pixels(pixels, 2)
+        out, report = optimize.optimize_png(data, filter_strategies=("none",),
+                                            zlib_strategies=(0,), levels=(0,), workers=0)
+        self.assertEqual(out, data)
+        self.assertEqual(report["saved_bytes"], 0)
+
+    def test_interlaced_skipped(self):
+        data = make_png(4, 4)
+        ihdr = chunks.pack_chunk(b"IHDR", struct.pack(">IIBBBBB", 4, 4, 8, 2, 0, 0, 1))
+        data = data[:8] + ihdr + data[8 + len(ihdr):]
+
+        out, report = optimize.optimize_png(data, workers=0)
+        self.assertIs(out, data)
+        self.assertEqual(report["skipped"], "interlaced")
+        self.assertEqual(report["saved_bytes"], 0)
+
+    def test_process_pool(self):
+        pixels = np.tile(np.arange(32, dtype=np.uint8), (32, 1))[..., None]
+        data = png_from_pixels(pixels, 0)
+        fd, fp = tempfile.mkstemp(suffix=".png")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            report = optimize.optimize_file(fp, workers=2)
+            with open(fp, "rb") as f:
+                out = f.read()
+        finally:
+            os.remove(fp)
+
+        self.assertEqual(report["path"], fp)
+        self.assertEqual(report["optimized_bytes"], len(out))
+        self.assertGreater(report["seconds"], 0)
+        self.assertSamePixels(data, out)
+
+    def test_optimize_file__failed_write(self):
+        # the original survives a write that doesn't finish
+        pixels = np.tile(np.arange(32, dtype=np.uint8), (32, 1))[..., None]
+        data = png_from_pixels(pixels, 0)
+        tmp_dir = tempfile.mkdtemp()
+        fp = os.path.join(tmp_dir, "image.png")
+        try:
+            with open(fp, "wb") as f:
+                f.write(data)
+            with mock.patch("os.replace", side_effect=OSError(28, "No space left on device")):
+                with self.assertRaises(OSError):
+                    optimize.optimize_file(fp, workers=0)
+            with open(fp, "rb") as f:
+                self.assertEqual(f.read(), data)
+            self.assertEqual(os.listdir(tmp_dir), ["image.png"])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_optimize_file__mode(self):
+        pixels = np.tile(np.arange(32, dtype=np.uint8), (32, 1))[..., None]
+        fd, fp = tempfile.mkstemp(suffix=".png")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(png_from_pixels(pixels, 0))
+            os.chmod(fp, 0o640)
+            report = optimize.optimize_file(fp, workers=0)
+            self.assertGreater(report["saved_bytes"], 0)
+            self.assertEqual(stat.S_IMODE(os.stat(fp).st_mode), 0o640)
+        finally:
+            os.remove(fp)
+
+    def test_optimize_file__nothing_saved(self):
+        # in place, a file that can't shrink is left alone
+        data = make_png(4, 4)
+        fd, fp = tempfile.mkstemp(suffix=".png")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            with mock.patch("optimize.optimize_png", return_value=(data, {"saved_bytes" : 0})):
+                with mock.patch("optimize._replace_file") as replace:
+                    optimize.optimize_file(fp)
+            replace.assert_not_called()
+        finally:
+            os.remove(fp)
+
+
+if __name__ == '__main__':
+    unittest.main()
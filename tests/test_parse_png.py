@@ -0,0 +1,115 @@
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import unittest
+import zlib
+
+import parse_png
+from .png_fixtures import make_png
+
+
+class TestParsePNG(unittest.TestCase):
+
+    def setUp(self):
+        itxt = b"Title\x00\x01\x00en\x00Titel\x00" + zlib.compress("Café".encode("utf-8"))
+        self.data = make_png(
+            3, 2,
+            before_idat=[
+                (b"pHYs", struct.pack(">IIB", 2835, 2835, 1)),
+                (b"tEXt", b"Author\x00luke"),
+                (b"tEXt", b"Software\x00png_parser"),
+            ],
+            after_idat=[
+                (b"tIME", struct.pack(">HBBBBB", 2016, 5, 4, 3, 2, 1)),
+                (b"iTXt", itxt),
+            ],
+            idat_parts=3,
+        )
+        fd, self.fp = tempfile.mkstemp(suffix=".png")
+        with os.fdopen(fd, "wb") as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        os.remove(self.fp)
+
+    def test_is_png(self):
+        self.assertTrue(parse_png.is_png(self.data))
+        self.assertFalse(parse_png.is_png(b"GIF89a\x00\x00"))
+
+    def test_parse_header(self):
+        self.assertIsNone(parse_png.parse_header(self.data[:5]))
+        self.assertIsNone(parse_png.parse_header(self.data[:parse_png.HEADER_LENGTH - 1]))
+        calc = parse_png.parse_header(self.data[:parse_png.HEADER_LENGTH])
+        self.assertEqual(calc["width"], 3)
+
+    def test_parse_header__not_IHDR(self):
+        with self.assertRaises(ValueError):
+            parse_png.parse_header(self.data[:8] + self.data[33:60])
+
+    def test_type_to_eng(self):
+        self.assertEqual(parse_png.type_to_eng("49484452"), "IHDR")
+        self.assertEqual(parse_png.type_to_eng("0x6348524D"), "cHRM")
+        self.assertIsNone(parse_png.type_to_eng("70725674"))
+        with self.assertRaises(TypeError):
+            parse_png.type_to_eng("IHDR")
+
+    def test_open_file(self):
+        self.assertEqual(parse_png.open_file(self.fp), self.data)
+
+    def test_break_into_chunks__IHDR(self):
+        chunks = parse_png.break_into_chunks(self.data)
+        calc = parse_png.process_IHDR(chunks["49484452"]["data"])
+        self.assertEqual(calc["width"], 3)
+        self.assertEqual(calc["height"], 2)
+        self.assertEqual(calc["color_type"], 2)
+
+    def test_scan_chunks__skips_IDAT(self):
+        chunks = parse_png.scan_chunks(self.fp)
+        calc = [c["type"] for c in chunks]
+        norm = ["IHDR", "pHYs", "tEXt", "tEXt", "tIME", "iTXt"]
+        self.assertEqual(norm, calc)
+
+    def test_scan_chunks__offsets(self):
+        for chunk in parse_png.scan_chunks(self.fp):
+            o = chunk["offset"]
+            self.assertEqual(self.data[o + 4:o + 8].decode("ascii"), chunk["type"])
+            self.assertEqual(self.data[o + 8:o + 8 + chunk["length"]], chunk["raw_data"])
+
+    def test_scan_chunks__stop_at_idat(self):
+        chunks = parse_png.scan_chunks(self.fp, stop_at_idat=True)
+        calc = [c["type"] for c in chunks]
+        norm = ["IHDR", "pHYs", "tEXt", "tEXt"]
+        self.assertEqual(norm, calc)
+
+    def test_scan_chunks__not_png(self):
+        with open(self.fp, "wb") as f:
+            f.write(b"not a png at all")
+
+        with self.assertRaises(ValueError):
+            parse_png.scan_chunks(self.fp)
+
+    def test_read_metadata(self):
+        calc = parse_png.read_metadata(self.fp)
+        self.assertEqual(calc["IHDR"]["width"], 3)
+        self.assertEqual(calc["pHYs"], {"ppu_x" : 2835, "ppu_y" : 2835, "unit" : 1})
+        self.assertEqual(calc["tIME"]["year"], 2016)
+        self.assertEqual(calc["tIME"]["second"], 1)
+        self.assertEqual(calc["tEXt"][1], {"keyword" : "Software", "text" : "png_parser"})
+        self.assertEqual(calc["iTXt"][0]["text"], "Café")
+        self.assertEqual(calc["iTXt"][0]["translated_keyword"], "Titel")
+
+    def test_import_is_light(self):
+        # header probing runs as a short-lived process per file
+        src = os.path.dirname(os.path.abspath(parse_png.__file__))
+        code = "import sys, parse_png; print(' '.join(sys.modules))"
+        loaded = subprocess.run([sys.executable, "-c", code], cwd=src, check=True,
+                                capture_output=True, text=True).stdout.split()
+        for heavy in ("numpy", "json", "threading", "concurrent.futures",
+                      "multiprocessing", "compression.huffman", "decode"):
+            self.assertNotIn(heavy, loaded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+
+from push_parser import ChunkParser, START, DATA, END, DONE
+from .png_fixtures import make_png
+
+
+def collect(parser, data, size):
+    """ feed `data` `size` bytes at a time, returning [(type, data, crc_ok)] """
+    chunks = []
+    for i in range(0, len(data), size):
+        for event in parser.feed(data[i:i + size]):
+            if (event[0] == START):
+                chunks.append([event[1], b"", None])
+            elif (event[0] == DATA):
+                chunks[-1][1] += bytes(event[2])
+            elif (event[0] == END):
+                chunks[-1][2] = event[2]
+
+    return [tuple(c) for c in chunks]
+
+
+class TestChunkParser(unittest.TestCase):
+
+    def setUp(self):
+        self.data = make_png(6, 4, before_idat=[(b"tEXt", b"key\x00value")], idat_parts=2)
+        self.norm = collect(ChunkParser(), self.data, len(self.data))
+
+    def test_whole_buffer(self):
+        calc = [c[0] for c in self.norm]
+        self.assertEqual(calc, ["IHDR", "tEXt", "IDAT", "IDAT", "IEND"])
+        self.assertEqual(self.norm[1][1], b"key\x00value")
+        self.assertTrue(all(c[2] for c in self.norm))
+
+    def test_any_feed_size(self):
+        for size in (1, 2, 3, 5, 7, 8, 13, 64):
+            parser = ChunkParser()
+            self.assertEqual(self.norm, collect(parser, self.data, size))
+            self.assertTrue(parser.done)
+            parser.close()
+
+    def test_data_is_not_buffered(self):
+        # with one byte feeds, each data event is a single byte
+        parser = ChunkParser()
+        for i in range(len(self.data)):
+            for event in parser.feed(self.data[i:i + 1]):
+                if (event[0] == DATA):
+                    self.assertEqual(len(event[2]), 1)
+
+    def test_bad_crc(self):
+        data = bytearray(self.data)
+        data[-20] ^= 0xFF # inside the last IDAT
+        calc = collect(ChunkParser(), bytes(data), 10)
+        self.assertFalse(calc[3][2])
+        self.assertTrue(calc[2][2])
+
+    def test_without_signature(self):
+        parser = ChunkParser(expect_signature=False)
+        self.assertEqual(self.norm, collect(parser, self.data[8:], 9))
+
+    def test_bad_signature(self):
+        with self.assertRaises(ValueError):
+            ChunkParser().feed(b"GIF89a\x00\x00\x00\x00")
+
+    def test_after_IEND(self):
+        parser = ChunkParser()
+        parser.feed(self.data)
+        self.assertEqual(parser.state, DONE)
+        with self.assertRaises(ValueError):
+            parser.feed(b"\x00")
+
+    def test_trailing_bytes(self):
+        parser = ChunkParser()
+        events = parser.feed(self.data + b"junk")
+        self.assertEqual(events[-1], (END, "IEND", True))
+        self.assertEqual(parser.unused_data, b"junk")
+        parser.close()
+        with self.assertRaises(ValueError):
+            parser.feed(b"more")
+
+    def test_close_truncated(self):
+        parser = ChunkParser()
+        parser.feed(self.data[:-5])
+        self.assertEqual(parser.offset, len(self.data) - 5)
+        with self.assertRaises(ValueError):
+            parser.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import struct
+import unittest
+
+import numpy as np
+
+import samples
+from .png_fixtures import make_png
+
+
+class TestSamples(unittest.TestCase):
+
+    def test_unpack_rows__1bit(self):
+        rows = np.array([[0b10110000], [0b01000000]], dtype=np.uint8)
+        calc = samples.unpack_rows(rows, 4, 1, 1)
+        np.testing.assert_array_equal(calc[..., 0], [[1, 0, 1, 1], [0, 1, 0, 0]])
+
+    def test_unpack_rows__4bit(self):
+        rows = np.array([[0xAB, 0xC0]], dtype=np.uint8)
+        calc = samples.unpack_rows(rows, 3, 4, 1)
+        np.testing.assert_array_equal(calc[0, :, 0], [10, 11, 12])
+
+    def test_unpack_rows__8bit_is_a_view(self):
+        rows = np.arange(12, dtype=np.uint8).reshape(2, 6)
+        calc = samples.unpack_rows(rows, 2, 8, 3)
+        self.assertTrue(np.shares_memory(calc, rows))
+        self.assertEqual(calc.shape, (2, 2, 3))
+
+    def test_unpack_rows__16bit_is_a_view(self):
+        rows = np.frombuffer(struct.pack(">HH", 1, 513), dtype=np.uint8).reshape(1, 4)
+        calc = samples.unpack_rows(rows, 2, 16, 1)
+        self.assertTrue(np.shares_memory(calc, rows))
+        self.assertEqual(calc.dtype, np.dtype(">u2"))
+        np.testing.assert_array_equal(calc[0, :, 0], [1, 513])
+
+    def test_to_layout__grey_2bit(self):
+        samp = np.array([[[0], [1], [2], [3]]], dtype=np.uint8)
+        calc = samples.to_layout(samp, 0, 2, "L8")
+        np.testing.assert_array_equal(calc[0, :, 0], [0, 85, 170, 255])
+
+    def test_to_layout__palette_trns(self):
+        idx = np.array([[[0], [1], [2]]], dtype=np.uint8)
+        palette = bytes([10, 20, 30, 40, 50, 60, 70, 80, 90])
+        calc = samples.to_layout(idx, 3, 8, "RGBA8", palette, bytes([0, 128]))
+        np.testing.assert_array_equal(calc[0], [[10, 20, 30, 0],
+                                                [40, 50, 60, 128],
+                                                [70, 80, 90, 255]])
+
+    def test_to_layout__palette_missing(self):
+        with self.assertRaises(ValueError):
+            samples.to_layout(np.zeros((1, 1, 1), dtype=np.uint8), 3, 8)
+
+    def test_to_layout__rgb_key(self):
+        samp = np.array([[[1, 2, 3], [1, 2, 4]]], dtype=np.uint8)
+        calc = samples.to_layout(samp, 2, 8, "RGBA8", trns=struct.pack(">HHH", 1, 2, 3))
+        np.testing.assert_array_equal(calc[0, :, 3], [0, 255])
+
+    def test_to_layout__depths(self):
+        samp = np.array([[[0x1234, 0xFFFF]]], dtype=">u2")
+        calc = samples.to_layout(samp, 4, 16, "LA8")
+        np.testing.assert_array_equal(calc[0, 0], [0x12, 0xFF])
+        calc = samples.to_layout(samp, 4, 16, "RGB16")
+        self.assertEqual(calc.dtype, np.uint16)
+        np.testing.assert_array_equal(calc[0, 0], [0x1234] * 3)
+        calc = samples.to_layout(np.array([[[7]]], dtype=np.uint8), 0, 8, "LA16")
+        np.testing.assert_array_equal(calc[0, 0], [7 * 257, 0xFFFF])
+
+    def test_to_layout__contiguous(self):
+        samp = np.arange(24, dtype=np.uint8).reshape(2, 3, 4)
+        for layout in samples.LAYOUTS:
+            self.assertTrue(samples.to_layout(samp, 6, 8, layout).flags.c_contiguous)
+
+    def test_to_layout__bad_layout(self):
+        with self.assertRaises(ValueError):
+            samples.to_layout(np.zeros((1, 1, 1), dtype=np.uint8), 0, 8, "CMYK8")
+
+    def test_decode_array__palette_4bit(self):
+        rows = [bytes([0x01, 0x20]), bytes([0x21, 0x00])]
+        data = make_png(3, 2, rows, bit_depth=4, color_type=3, before_idat=[
+            (b"PLTE", bytes([0, 0, 0, 255, 255, 255, 255, 0, 0])),
+            (b"tRNS", bytes([0])),
+        ])
+        header, calc = samples.decode_array(data, "RGBA8")
+        self.assertEqual(calc.shape, (2, 3, 4))
+        np.testing.assert_array_equal(calc[0, 1], [255, 255, 255, 255])
+        np.testing.assert_array_equal(calc[1, 0], [255, 0, 0, 255])
+        np.testing.assert_array_equal(calc[0, 0], [0, 0, 0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
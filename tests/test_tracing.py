@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+import unittest
+
+import chunks
+import decode
+import parse_png
+import tracing
+from .png_fixtures import make_png
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.data = make_png(8, 6)
+
+    def test_off_by_default(self):
+        self.assertIsNone(tracing.get_tracer())
+        with tracing.span("x") as span:
+            span.nbytes = 10
+        self.assertEqual(tracing.span("y").nbytes, 0)
+
+    def test_callback(self):
+        calls = []
+        with tracing.tracing(lambda *a : calls.append(a)):
+            parse_png.is_png(self.data)
+        self.assertIsNone(tracing.get_tracer())
+        self.assertEqual([(c[0], c[2]) for c in calls], [("signature", 8)])
+        self.assertGreaterEqual(calls[0][1], 0)
+
+    def test_parse_stages(self):
+        fd, fp = tempfile.mkstemp(suffix=".png")
+        with os.fdopen(fd, "wb") as f:
+            f.write(self.data)
+        try:
+            with tracing.profile() as prof:
+                png = parse_png.break_into_chunks(parse_png.open_file(fp))
+                parse_png.process_IHDR(png["49484452"]["data"])
+                parse_png.process_IDAT(png["49444154"]["data"])
+        finally:
+            os.remove(fp)
+
+        report = prof.to_dict()
+        self.assertEqual(set(report), {"read", "chunks", "signature", "IHDR", "IDAT"})
+        self.assertEqual(report["read"]["bytes"], len(self.data))
+        self.assertEqual(report["chunks"]["bytes"], len(self.data))
+        self.assertEqual(report["IHDR"]["bytes"], 13)
+        self.assertEqual(report["IHDR"]["count"], 1)
+
+    def test_decode_stages(self):
+        with tracing.profile() as prof:
+            for chunk in chunks.iter_chunks(self.data):
+                chunk.check_crc()
+            decode.decode_rows(self.data)
+
+        report = prof.to_dict()
+        # all 6 rows fit in one block
+        self.assertEqual(report["unfilter"]["count"], 1)
+        self.assertEqual(report["unfilter"]["bytes"], 6 * 8 * 3)
+        idat = [c for c in chunks.iter_chunks(self.data) if c.type_code == b"IDAT"]
+        self.assertEqual(report["inflate"]["bytes"], sum(c.length for c in idat))
+        self.assertEqual(report["crc"]["count"], 3)
+
+    def test_inflate_flush(self):
+        # read to the end, the closing flush is timed too
+        idat = [c.data for c in chunks.iter_chunks(self.data) if c.type_code == b"IDAT"]
+        with tracing.profile() as prof:
+            list(decode._iter_filtered_rows(iter(idat), 8 * 3 + 1))
+        self.assertEqual(prof.to_dict()["inflate"]["count"], len(idat) + 1)
+
+    def test_histogram(self):
+        prof = tracing.Profiler()
+        for seconds in (0.0000005, 0.000003, 0.000003, 0.001):
+            prof("stage", seconds, 100)
+
+        calc = json.loads(prof.to_json())["stage"]
+        self.assertEqual(calc["histogram"], {"<1us" : 1, "<4us" : 2, "<1024us" : 1})
+        self.assertEqual(calc["count"], 4)
+        self.assertEqual(calc["bytes"], 400)
+        self.assertAlmostEqual(calc["max"], 0.001)
+
+
+if __name__ == '__main__':
+    unittest.main()